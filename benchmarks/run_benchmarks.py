@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks for the per-request overhead of the Bottle Swagger plugin.
+
+Every scenario is run against a bare Bottle application and against the same application with the plugin
+installed (in a few configurations), by calling the WSGI application directly, so no network server or
+HTTP client is involved. The results are reported as the time per request, and the overhead over the bare
+application.
+
+Usage::
+
+  $ python benchmarks/run_benchmarks.py
+  $ python benchmarks/run_benchmarks.py --save benchmarks/results/2.0.10.json
+  $ python benchmarks/run_benchmarks.py --compare benchmarks/results/2.0.10.json
+
+Results are saved as JSON, so that the runs of different versions (on the same machine) can be compared.
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+import platform
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from six.moves.urllib.parse import urlencode
+from bottle import Bottle, request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bottle_swagger import SwaggerPlugin, __version__  # noqa: E402
+
+THING = {"id": "123", "name": "foo", "tags": ["a", "b"], "size": {"width": 10, "height": 20}}
+FILLER_ROUTES = 200
+
+THING_SCHEMA = {
+    "type": "object",
+    "required": ["id", "name"],
+    "properties": {
+        "id": {"type": "string"},
+        "name": {"type": "string", "maxLength": 64},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "size": {
+            "type": "object",
+            "properties": {
+                "width": {"type": "integer", "minimum": 0},
+                "height": {"type": "integer", "minimum": 0}
+            }
+        }
+    }
+}
+
+
+def _thing_response():
+    return {"200": {"description": "", "schema": {"$ref": "#/definitions/Thing"}}}
+
+
+def build_swagger_def(filler_routes=FILLER_ROUTES):
+    paths = {
+        "/things": {
+            "post": {
+                "parameters": [{
+                    "name": "thing", "in": "body", "required": True, "schema": {"$ref": "#/definitions/Thing"}
+                }],
+                "responses": _thing_response()
+            }
+        },
+        "/bulk": {
+            "post": {
+                "parameters": [{
+                    "name": "things", "in": "body", "required": True,
+                    "schema": {"type": "array", "items": {"$ref": "#/definitions/Thing"}}
+                }],
+                "responses": {"200": {"description": "", "schema": {"type": "object", "properties": {
+                    "count": {"type": "integer"}
+                }}}}
+            }
+        },
+        "/things/{thing_id}": {
+            "get": {
+                "parameters": [{"name": "thing_id", "in": "path", "required": True, "type": "integer"}],
+                "responses": _thing_response()
+            }
+        },
+        "/search": {
+            "get": {
+                "parameters": [
+                    {"name": "name", "in": "query", "required": True, "type": "string"},
+                    {"name": "limit", "in": "query", "type": "integer", "minimum": 1, "maximum": 100},
+                    {"name": "order", "in": "query", "type": "string", "enum": ["asc", "desc"]}
+                ],
+                "responses": _thing_response()
+            }
+        },
+        "/form": {
+            "post": {
+                "consumes": ["application/x-www-form-urlencoded"],
+                "parameters": [
+                    {"name": "name", "in": "formData", "required": True, "type": "string"},
+                    {"name": "size", "in": "formData", "type": "integer"}
+                ],
+                "responses": _thing_response()
+            }
+        }
+    }
+    for index in range(filler_routes):
+        paths["/filler_{}/{{filler_id}}".format(index)] = {
+            "get": {
+                "parameters": [{"name": "filler_id", "in": "path", "required": True, "type": "string"}],
+                "responses": _thing_response()
+            }
+        }
+    return {
+        "swagger": "2.0",
+        "info": {"version": "1.0.0", "title": "bottle-swagger benchmarks"},
+        "consumes": ["application/json"],
+        "produces": ["application/json"],
+        "definitions": {"Thing": THING_SCHEMA},
+        "paths": paths
+    }
+
+
+def build_app(plugin_kwargs=None, filler_routes=FILLER_ROUTES):
+    """
+    :param plugin_kwargs: The arguments for the plugin, or None for a bare Bottle application.
+    """
+    app = Bottle()
+    if plugin_kwargs is not None:
+        app.install(SwaggerPlugin(build_swagger_def(filler_routes), **plugin_kwargs))
+
+    @app.post("/things")
+    def post_thing():
+        return request.json
+
+    @app.post("/bulk")
+    def post_bulk():
+        return {"count": len(request.json)}
+
+    @app.get("/things/<thing_id>")
+    def get_thing(thing_id):
+        return dict(THING, id=thing_id)
+
+    @app.get("/search")
+    def search():
+        return dict(THING, name=request.query.name)
+
+    @app.post("/form")
+    def post_form():
+        return dict(THING, name=request.forms.name)
+
+    def get_filler(filler_id):
+        return dict(THING, id=filler_id)
+
+    for index in range(filler_routes):
+        app.get("/filler_{}/<filler_id>".format(index), callback=get_filler)
+
+    return app
+
+
+def make_request(method, path, query=None, body=b'', content_type=None):
+    """
+    :return: A function building a fresh WSGI environ for the request each time it is called.
+    """
+    base_environ = {}
+    setup_testing_defaults(base_environ)
+    base_environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': urlencode(query or {}),
+        'CONTENT_LENGTH': str(len(body)),
+    })
+    if content_type is not None:
+        base_environ['CONTENT_TYPE'] = content_type
+
+    def environ():
+        request_environ = dict(base_environ)
+        request_environ['wsgi.input'] = BytesIO(body)
+        return request_environ
+    return environ
+
+
+def _json_request(path, payload):
+    return make_request('POST', path, body=json.dumps(payload).encode('utf-8'), content_type='application/json')
+
+
+SCENARIOS = [
+    ("get_path_param", make_request('GET', '/things/42')),
+    ("get_query_params", make_request('GET', '/search', query={"name": "foo", "limit": "10", "order": "asc"})),
+    ("post_form", make_request(
+        'POST', '/form', body=b'name=foo&size=3', content_type='application/x-www-form-urlencoded'
+    )),
+    ("post_small_body", _json_request('/things', THING)),
+    ("post_large_body", _json_request('/bulk', [dict(THING, id=str(index)) for index in range(500)])),
+    ("get_last_of_many_routes", make_request('GET', '/filler_{}/abc'.format(FILLER_ROUTES - 1))),
+]
+
+CONFIGURATIONS = [
+    ("bare", None),
+    ("jsonschema", {}),
+    ("no_response_validation", {"validate_responses": False}),
+    ("compiled", {"validation_engine": "compiled"}),
+]
+
+
+def run_request(app, environ):
+    statuses = []
+    body = b''.join(app(environ(), lambda status, headers, exc_info=None: statuses.append(status)))
+    return statuses[0], body
+
+
+def benchmark(app, environ, number, repeat):
+    """
+    :return: The best time per request out of ``repeat`` runs of ``number`` requests, in seconds.
+    """
+    status, body = run_request(app, environ)
+    if not status.startswith('200'):
+        raise AssertionError("Unexpected response {}: {!r}".format(status, body[:200]))
+    timer = timeit.Timer(lambda: run_request(app, environ))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(number, repeat, scenario_names=None):
+    results = {}
+    for configuration_name, plugin_kwargs in CONFIGURATIONS:
+        # build_app builds a new spec dict for every application, since Bravado annotates the one it is given.
+        app = build_app(plugin_kwargs)
+        for scenario_name, environ in SCENARIOS:
+            if scenario_names and scenario_name not in scenario_names:
+                continue
+            results.setdefault(scenario_name, {})[configuration_name] = benchmark(app, environ, number, repeat)
+    return results
+
+
+def format_results(results, baseline=None):
+    configuration_names = [name for name, _ in CONFIGURATIONS]
+    lines = ["{:<26}".format("scenario (us/request)") + "".join(
+        "{:>30}".format(name) for name in configuration_names
+    )]
+    for scenario_name, timings in sorted(results.items()):
+        cells = []
+        bare = timings.get("bare")
+        for configuration_name in configuration_names:
+            timing = timings.get(configuration_name)
+            if timing is None:
+                cells.append("{:>30}".format("-"))
+                continue
+            cell = "{:.1f}".format(timing * 1e6)
+            if bare and configuration_name != "bare":
+                cell += " (+{:.1f})".format((timing - bare) * 1e6)
+            previous = (baseline or {}).get(scenario_name, {}).get(configuration_name)
+            if previous:
+                cell += " [{:+.0%}]".format(timing / previous - 1)
+            cells.append("{:>30}".format(cell))
+        lines.append("{:<26}".format(scenario_name) + "".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=500, help="Requests per timing run.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per benchmark; the best one is kept.")
+    parser.add_argument("--scenario", action="append", help="Only run the given scenario(s).")
+    parser.add_argument("--save", help="Save the results to this JSON file.")
+    parser.add_argument("--compare", help="Compare the results to the ones saved in this JSON file.")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = run_benchmarks(args.number, args.repeat, args.scenario)
+    print(format_results(results, baseline))
+    if baseline is not None:
+        print("\n(+x) is the overhead over the bare application, [x%] the change relative to {}".format(args.compare))
+
+    if args.save:
+        directory = os.path.dirname(os.path.abspath(args.save))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(args.save, "w") as f:
+            json.dump({
+                "bottle_swagger_version": ".".join(str(part) for part in __version__),
+                "python_version": platform.python_version(),
+                "platform": platform.platform(),
+                "number": args.number,
+                "repeat": args.repeat,
+                "results": results
+            }, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
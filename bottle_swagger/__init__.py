@@ -1,37 +1,395 @@
 __version__ = (2, 0, 10)
 
+import gc
 import os
 import re
+import sys
+import json
+import time
+import zlib
+import codecs
+import copy
+import pickle
+import random
+import hashlib
+import posixpath
 import logging
-from bottle import request, response, HTTPResponse, json_dumps, static_file
-from bravado_core.exception import MatchingResponseNotFound, SwaggerSecurityValidationError
-from bravado_core.request import IncomingRequest, unmarshal_request
-from bravado_core.response import OutgoingResponse, validate_response, get_response_spec
+import tempfile
+import mimetypes
+import threading
+from io import BytesIO
+from functools import partial
+from collections import OrderedDict
+from bottle import request, response, BaseRequest, HTTPResponse, HTTPError, FormsDict, FileUpload, json_dumps
+from bravado_core.content_type import APP_JSON, APP_MSGPACK
+from bravado_core.exception import MatchingResponseNotFound, SwaggerMappingError, SwaggerSecurityValidationError
+from bravado_core.model import MODEL_MARKER, is_object
+from bravado_core.param import cast_request_param, get_param_type_spec, unmarshal_collection_format
+from bravado_core.request import IncomingRequest
+from bravado_core.response import EMPTY_BODIES, OutgoingResponse
+from bravado_core.schema import SWAGGER_PRIMITIVES, get_default
+from bravado_core.swagger20_validator import get_validator_type
+from bravado_core.unmarshal import unmarshal_schema_object
+from bravado_core.validate import scrub_sensitive_value, validate_schema_object
 from bravado_core.spec import Spec
+from bravado_core import version as bravado_core_version
 from jsonschema import ValidationError
 from six.moves.urllib.parse import urljoin, urlparse
+import six
 from six import string_types, binary_type
 from bottle import SimpleTemplate
+from bottle_swagger.codegen import generate_schema_validator, generate_request_unmarshaller, generate_response_validator
 
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
 
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+
+SWAGGER_UI_VERSION = '3.24.1'
 SWAGGER_UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-        'vendor', 'swagger-ui-3.24.1-dist')
+        'vendor', 'swagger-ui-{}-dist'.format(SWAGGER_UI_VERSION))
 SWAGGER_UI_INDEX_TEMPLATE_PATH = os.path.join(SWAGGER_UI_DIR, 'index.html.st')
 
 with open(SWAGGER_UI_INDEX_TEMPLATE_PATH, 'r') as f:
     SWAGGER_UI_INDEX_TEMPLATE = f.read()
 
+# Bottle compiles the template on first use and keeps the compiled code around for later renders.
+_swagger_ui_index_template = SimpleTemplate(SWAGGER_UI_INDEX_TEMPLATE)
+
 
 plugin_logger = logging.getLogger(__name__)
 
+# Matches bottle "<param>" and "<param:filter>" style path wildcards.
+BOTTLE_PATH_PARAM_PATTERN = re.compile(r'/<(.+?)(:.+)?>')
+
+# time.perf_counter is not available on Python 2.
+_timer = getattr(time, 'perf_counter', time.time)
+
+# How the plugin treats a route, decided once when the plugin is applied to it.
+ROUTE_KIND_OPERATION = 'operation'
+ROUTE_KIND_PASSTHROUGH = 'passthrough'
+ROUTE_KIND_SCHEMA = 'schema'
+ROUTE_KIND_UI = 'ui'
+ROUTE_KIND_NOT_FOUND = 'not_found'
+
 
 def render_index_html(swagger_spec_url, validator_url=None):
-    return SimpleTemplate(SWAGGER_UI_INDEX_TEMPLATE).render(
+    return _swagger_ui_index_template.render(
         swagger_spec_url=swagger_spec_url,
-        validator_url=json_dumps(validator_url)
+        validator_url=json_dumps(validator_url),
+        swagger_ui_version=SWAGGER_UI_VERSION
+    )
+
+
+# Content types of the vendored Swagger UI files worth compressing; the favicons are already compressed.
+COMPRESSIBLE_CONTENT_TYPES = ('text/', 'application/javascript', 'application/json')
+VALIDATION_ENGINE_JSONSCHEMA = 'jsonschema'
+VALIDATION_ENGINE_COMPILED = 'compiled'
+VALIDATION_ENGINES = (VALIDATION_ENGINE_JSONSCHEMA, VALIDATION_ENGINE_COMPILED)
+# Request phases timed, and events counted, for the metrics.
+PHASE_REQUEST_VALIDATION = 'request_validation'
+PHASE_HANDLER = 'handler'
+PHASE_RESPONSE_VALIDATION = 'response_validation'
+PHASE_SERIALIZATION = 'serialization'
+PHASE_TOTAL = 'total'
+COUNTER_INVALID_REQUEST = 'invalid_request'
+COUNTER_INVALID_SECURITY = 'invalid_security'
+COUNTER_INVALID_RESPONSE = 'invalid_response'
+COUNTER_NOT_FOUND = 'not_found'
+COUNTER_EXCEPTION = 'exception'
+# Parameter locations, types and (validating) keywords the scalar parameter fast path knows how to check.
+SCALAR_PARAM_LOCATIONS = ('path', 'query', 'header', 'formData')
+SCALAR_PARAM_TYPES = {
+    'string': string_types,
+    'integer': six.integer_types,
+    'number': six.integer_types + (float,),
+    'boolean': (bool,),
+}
+SCALAR_PARAM_KEYWORDS = frozenset([
+    'type', 'format', 'enum', 'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum',
+    'minLength', 'maxLength', 'pattern',
+    # Not validated at all.
+    'name', 'in', 'required', 'description', 'default', 'allowEmptyValue'
+])
+
+
+class SwaggerUIAsset(object):
+    """
+    A file from the bundled Swagger UI, read once and kept in memory along with
+    its compressed variants.
+
+    Users should not need to consume this directly.
+    """
+    def __init__(self, path, content_type, body):
+        self.path = path
+        self.content_type = content_type
+        self.etag = _make_etag(body)
+        # (Content-Encoding, body, ETag) triples, most preferred encoding first.
+        self.variants = []
+
+        if content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            if brotli is not None:
+                self._add_variant('br', brotli.compress(body), body)
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._add_variant('gzip', compressor.compress(body) + compressor.flush(), body)
+        self.variants.append((None, body, self.etag))
+
+    def _add_variant(self, encoding, compressed_body, body):
+        if len(compressed_body) < len(body):
+            # Each representation needs its own strong ETag.
+            self.variants.append((encoding, compressed_body, '"{}-{}"'.format(self.etag.strip('"'), encoding)))
+
+    def negotiate(self, accept_encoding):
+        """
+        Pick the best variant of this asset for the given Accept-Encoding header.
+
+        :param accept_encoding: The Accept-Encoding header of the request, if any.
+        :type accept_encoding: str | NoneType
+        :return: The Content-Encoding (None for identity), the body and the ETag of the variant.
+        :rtype: tuple
+        """
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding, body, etag in self.variants:
+            if encoding is None or encoding in accepted or '*' in accepted:
+                return encoding, body, etag
+
+    @classmethod
+    def from_file(cls, path, filename):
+        if filename.endswith('.map'):
+            content_type = 'application/json'
+        else:
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=UTF-8'
+        with open(filename, 'rb') as asset_file:
+            return cls(path, content_type, asset_file.read())
+
+
+# Only these files are ever served (and cached), whatever path a request asks for.
+SWAGGER_UI_ASSET_NAMES = frozenset(
+    name for name in os.listdir(SWAGGER_UI_DIR) if os.path.isfile(os.path.join(SWAGGER_UI_DIR, name))
+)
+_swagger_ui_assets = {}
+
+
+def load_swagger_ui_asset(path):
+    """
+    Load (and cache) a file from the bundled Swagger UI.
+
+    :param path: The path of the file, relative to the Swagger UI directory.
+    :type path: str
+    :return: The cached asset, or None if no such file exists.
+    :rtype: SwaggerUIAsset | NoneType
+    """
+    # Every spelling of a path ("x/../swagger-ui.js", ...) shares the one cached asset of the file it names.
+    name = posixpath.normpath(path.replace('\\', '/')).strip('/')
+    try:
+        return _swagger_ui_assets[name]
+    except KeyError:
+        pass
+
+    if name not in SWAGGER_UI_ASSET_NAMES:
+        return None
+    asset = _swagger_ui_assets[name] = SwaggerUIAsset.from_file(name, os.path.join(SWAGGER_UI_DIR, name))
+    return asset
+
+
+def _parse_accept_encoding(accept_encoding):
+    accepted = set()
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        try:
+            quality = float(params.strip()[2:]) if params.strip().startswith('q=') else 1.0
+        except ValueError:
+            quality = 1.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+# The spec cache keeps the entries most recently used, so that it doesn't grow with every change to the spec.
+SPEC_CACHE_FILE_PREFIX = 'bottle-swagger-spec-'
+SPEC_CACHE_MAX_ENTRIES = 8
+
+
+def _spec_cache_key(swagger_def, bravado_config):
+    config = dict(bravado_config)
+    config['formats'] = sorted(user_format.format for user_format in config.get('formats', []))
+    key_source = json.dumps(
+        [__version__, bravado_core_version, sys.version_info[:2], config, swagger_def],
+        sort_keys=True, default=repr
+    )
+    return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+
+
+def build_swagger_spec(swagger_def, bravado_config, spec_cache_dir=None):
+    """
+    Build the Bravado Core spec for a Swagger specification, optionally going through
+    an on-disk cache of previously built (validated and dereferenced) specs.
+
+    Cache entries are keyed by a hash of the Swagger specification, the Bravado configuration and the
+    versions of this plugin, Bravado Core and Python, so stale entries are never picked up. Only the
+    ``SPEC_CACHE_MAX_ENTRIES`` most recently used entries are kept. The cache holds pickles, so it must
+    live in a directory only trusted users can write to.
+
+    :param swagger_def: The raw Swagger 2.0 specification, as a Python dictionary.
+    :type swagger_def: dict
+    :param bravado_config: The Bravado Core configuration.
+    :type bravado_config: dict
+    :param spec_cache_dir: The cache directory, or None to always build the spec from scratch.
+    :type spec_cache_dir: str | NoneType
+    :return: The built spec.
+    :rtype: bravado_core.spec.Spec
+    """
+    if spec_cache_dir is None:
+        return Spec.from_dict(swagger_def, config=bravado_config)
+
+    cache_path = os.path.join(
+        spec_cache_dir, '{}{}.pickle'.format(SPEC_CACHE_FILE_PREFIX, _spec_cache_key(swagger_def, bravado_config))
+    )
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            swagger = pickle.load(cache_file)
+        plugin_logger.debug("Loaded the Swagger spec from %s", cache_path)
+        _touch(cache_path)
+        return swagger
+    except (IOError, OSError):
+        pass
+    except Exception:
+        plugin_logger.warning("Ignoring unreadable Swagger spec cache file %s", cache_path, exc_info=True)
+
+    # Bravado Core annotates the dictionaries it is given (e.g. with "x-scope"), which would change the key of
+    # the spec for any later build from the same dictionary in this process.
+    swagger = Spec.from_dict(copy.deepcopy(swagger_def), config=bravado_config)
+    try:
+        if not os.path.isdir(spec_cache_dir):
+            os.makedirs(spec_cache_dir)
+        # Write to a temporary file first, so other processes never see a partially written cache file.
+        fd, temp_path = tempfile.mkstemp(dir=spec_cache_dir, prefix=SPEC_CACHE_FILE_PREFIX, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                pickle.dump(swagger, temp_file, pickle.HIGHEST_PROTOCOL)
+            # os.replace is not available on Python 2, where os.rename replaces the file as well (except on Windows).
+            getattr(os, 'replace', os.rename)(temp_path, cache_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        _prune_spec_cache(spec_cache_dir)
+    except Exception:
+        # e.g. user defined formats built from lambdas can't be pickled.
+        plugin_logger.warning("Unable to cache the Swagger spec in %s", spec_cache_dir, exc_info=True)
+    return swagger
+
+
+def _touch(path):
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _prune_spec_cache(spec_cache_dir):
+    # Removes all but the most recently used entries; other processes may be pruning (or loading) them meanwhile.
+    entries = []
+    for file_name in os.listdir(spec_cache_dir):
+        if file_name.startswith(SPEC_CACHE_FILE_PREFIX) and file_name.endswith('.pickle'):
+            path = os.path.join(spec_cache_dir, file_name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+    entries.sort(reverse=True)
+    for _, path in entries[SPEC_CACHE_MAX_ENTRIES:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _to_json_bytes(obj, json_encoder=None):
+    encoded = json_dumps(obj) if json_encoder is None else json_encoder(obj)
+    return encoded if isinstance(encoded, binary_type) else encoded.encode('utf-8')
+
+
+def _is_item_stream(payload):
+    # Generators and other iterators, but not the containers and file-like objects Bottle handles itself.
+    return (
+        not isinstance(payload, (dict, list, string_types, binary_type)) and
+        not hasattr(payload, 'read') and
+        hasattr(payload, '__iter__') and
+        (hasattr(payload, '__next__') or hasattr(payload, 'next'))
     )
 
 
+def _is_coroutine(result):
+    return asyncio is not None and asyncio.iscoroutine(result)
+
+
+def _running_event_loop():
+    # asyncio.get_running_loop is only there from Python 3.7 on.
+    get_running_loop = getattr(asyncio, '_get_running_loop', None)
+    return get_running_loop() if get_running_loop is not None else None
+
+
+def run_coroutine(coroutine):
+    """
+    Run a coroutine (returned by an async route callback) to completion on a new event loop, closed again
+    once it is done. Since the coroutine runs in the thread handling the request, Bottle's thread-local
+    ``request`` and ``response`` are still those of the request.
+
+    :return: The result of the coroutine.
+    :raises RuntimeError: If an event loop is already running in the calling thread (e.g. a WSGI app called
+        from an ASGI bridge), which can't be blocked on until the coroutine is done.
+    """
+    if _running_event_loop() is not None:
+        coroutine.close()
+        raise RuntimeError(
+            "Can't run the coroutine returned by a route callback: an event loop is already running in this "
+            "thread. Run the app from a thread without one, or return the result instead of a coroutine."
+        )
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _close_iterator(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+def _make_etag(body):
+    return '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+def _etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, as mandated for If-None-Match by RFC 7232.
+    return any(candidate.strip() in (etag, 'W/' + etag) for candidate in if_none_match.split(','))
+
+
+def _cacheable_response(body, etag, content_type, cache_control):
+    response.set_header('ETag', etag)
+    response.set_header('Cache-Control', cache_control)
+    if _etag_matches(etag, request.headers.get('If-None-Match')):
+        response.status = 304
+        return b''
+    response.content_type = content_type
+    return body
+
+
 def _error_response(status, e):
     response.status = status
     return {"code": status, "message": str(e)}
@@ -94,6 +452,44 @@ def default_invalid_security_handler(e):
     return _error_response(401, e)
 
 
+def default_request_too_large_handler(e):
+    """
+    The default error handler function for request bodies larger than
+    the operation allows.
+
+    Returns a JSON payload of
+
+    {"code": 413, "message": str(e)}
+
+    And sets the status code to 413.
+
+    :param e: The exception describing the oversized body.
+    :type e: RequestBodyTooLarge
+    :return: The response payload.
+    :rtype: dict
+    """
+    return _error_response(413, e)
+
+
+def default_unsupported_media_type_handler(e):
+    """
+    The default error handler function for request bodies of a content
+    type the operation doesn't consume.
+
+    Returns a JSON payload of
+
+    {"code": 415, "message": str(e)}
+
+    And sets the status code to 415.
+
+    :param e: The exception describing the unsupported content type.
+    :type e: UnsupportedMediaType
+    :return: The response payload.
+    :rtype: dict
+    """
+    return _error_response(415, e)
+
+
 def default_not_found_handler(r):
     """
     The default error handler function for route not found failures.
@@ -112,29 +508,1115 @@ def default_not_found_handler(r):
     return _error_response(404, r)
 
 
-class SecurityPatchedOperation(object):
-    def __init__(self, core_op):
-        self._core_op = core_op
+class SwaggerSecurityPlan(object):
+    """
+    The security requirements of a Swagger operation, reduced ahead of time to the names of the
+    API key parameters each of them needs, so checking a request is a few dictionary lookups.
+
+    Users should not need to consume this directly.
+    """
+    __slots__ = ('requirements', 'checks_api_keys', 'credential_checks')
+
+    def __init__(self, swagger_op, verifiers=None):
+        requirements = swagger_op.security_requirements
+        combinations = swagger_op.acceptable_security_definition_combinations
+        # (parameter names, definition names) for every alternative, in the order of the spec.
+        self.requirements = [
+            (tuple(definition.name for definition in requirement), combination)
+            for requirement, combination in zip(requirements, combinations)
+        ]
+        # Like Bravado, only API keys are actually checked.
+        self.checks_api_keys = any(
+            definition.type == 'apiKey' for requirement in requirements for definition in requirement
+        )
+        # For every alternative, (definition name, credential getter, verifier or None) for each of its definitions;
+        # only worked out if any of the definitions of the operation has a verifier.
+        self.credential_checks = None
+        verifiers = verifiers or {}
+        if any(name in verifiers for combination in combinations for name in combination):
+            self.credential_checks = [
+                [
+                    (name, _credential_getter(definition), verifiers.get(name))
+                    for name, definition in requirement.security_definitions.items()
+                ]
+                for requirement in requirements
+            ]
+
+    def check(self, request_data):
+        """
+        :param request_data: The unmarshalled parameters of the request.
+        :type request_data: dict
+        :raises SwaggerSecurityValidationError: If none, or (ambiguously) several, of the requirements are met.
+        """
+        # Mirrors bravado_core.validate.validate_security_object.
+        matched = [
+            combination for names, combination in self.requirements
+            if all(request_data.get(name) is not None for name in names)
+        ]
+        if not matched:
+            raise SwaggerSecurityValidationError('No security definition used.')
+        elif len(matched) > 1:
+            by_length = sorted((set(combination) for combination in matched), key=len, reverse=True)
+            if len(by_length[0]) == len(by_length[-1]) or not all(
+                by_length[0].issuperset(combination) for combination in by_length
+            ):
+                raise SwaggerSecurityValidationError(
+                    "More than one security definition is in use at the same time ({0})".format(
+                        ', '.join(str(combination) for combination in matched)
+                    )
+                )
+
+    def verify(self, bottle_request, request_data, cache=None):
+        """
+        Verify the credentials of a request with the verifiers of the security definitions, trying the
+        alternatives in the order of the spec. An alternative is met once all its definitions have credentials
+        in the request, and the verifiers (of those that have one) accept them.
+
+        :param bottle_request: The request.
+        :type bottle_request: bottle.BaseRequest
+        :param request_data: The unmarshalled parameters of the request.
+        :type request_data: dict
+        :param cache: If not None, where verified credentials are looked up first, and stored.
+        :type cache: CredentialCache | NoneType
+        :return: The principal returned by the first verifier of the alternative that was met, or None.
+        :raises SwaggerSecurityValidationError: If none of the alternatives is met.
+        """
+        rejected = None
+        for checks in self.credential_checks:
+            principals = []
+            for name, get_credential, verifier in checks:
+                credential = get_credential(bottle_request, request_data)
+                if credential is None:
+                    break
+                elif verifier is None:
+                    continue
+                principal = None if cache is None else cache.get((name, credential))
+                if principal is None:
+                    principal = verifier(credential)
+                    if principal is None or principal is False:
+                        rejected = name
+                        break
+                    elif cache is not None:
+                        cache.put((name, credential), principal)
+                principals.append(principal)
+            else:
+                return principals[0] if principals else None
+
+        if rejected is not None:
+            raise SwaggerSecurityValidationError("Invalid credentials for security definition {0}.".format(rejected))
+        raise SwaggerSecurityValidationError('No security definition used.')
+
+
+def _credential_getter(security_definition):
+    # Returns a (bottle request, request data) -> credential (or None) function for the security definition.
+    if security_definition.type == 'apiKey':
+        name = security_definition.name
+        return lambda bottle_request, request_data: request_data.get(name)
+    elif security_definition.type == 'basic':
+        return lambda bottle_request, request_data: bottle_request.auth
+    return _bearer_token
+
+
+def _bearer_token(bottle_request, request_data):
+    scheme, _, token = bottle_request.environ.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'bearer':
+        return None
+    return token.strip() or None
+
+
+class CredentialCache(object):
+    """
+    A bounded cache of verified credentials (see the ``security_verifiers`` option of ``SwaggerPlugin``),
+    forgetting entries ``ttl`` seconds after they were verified, and the least recently used ones first
+    once it is full. It is safe to share between threads.
+    """
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        :param key: The security definition name and the credential.
+        :type key: tuple
+        :return: The principal the credential was verified as, or None if it isn't (or no longer) cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            elif entry[1] <= _timer():
+                return None
+            self._entries[key] = entry
+            return entry[0]
+
+    def put(self, key, principal):
+        """
+        :param key: The security definition name and the credential.
+        :type key: tuple
+        :param principal: The principal the credential was verified as.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (principal, _timer() + self.ttl)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _jsonschema_validator(swagger_spec, schema_object_spec):
+    validator = get_validator_type(swagger_spec)(
+        schema_object_spec,
+        format_checker=swagger_spec.format_checker,
+        resolver=swagger_spec.resolver
+    )
+    return scrub_sensitive_value(validator.validate)
+
+
+def compile_schema_validator(swagger_spec, schema_object_spec, validation_engine=VALIDATION_ENGINE_JSONSCHEMA):
+    """
+    Build the validator for values of a Swagger schema object once, instead of on every validation the way
+    ``bravado_core.validate.validate_schema_object`` does.
+
+    :param swagger_spec: The Bravado Core spec the schema object belongs to.
+    :type swagger_spec: bravado_core.spec.Spec
+    :param schema_object_spec: The schema object (or parameter/header spec) to validate values against.
+    :type schema_object_spec: dict
+    :param validation_engine: "jsonschema" to build a jsonschema validator, or "compiled" to generate Python code
+        for the validator (see ``bottle_swagger.codegen``).
+    :type validation_engine: str
+    :return: A callable taking a value and raising a ``jsonschema.ValidationError`` if it is invalid, or None if
+        values of this schema object are not validated at all (no type, or a file).
+    :rtype: (object -> NoneType) | NoneType
+    """
+    deref = swagger_spec.deref
+    schema_object_spec = deref(schema_object_spec)
+    default_type = 'object' if swagger_spec.config['default_type_to_object'] else None
+    obj_type = deref(schema_object_spec.get('type', default_type))
+
+    if not obj_type or obj_type == 'file':
+        return None
+    elif obj_type not in SWAGGER_PRIMITIVES and obj_type != 'array' and not is_object(swagger_spec, schema_object_spec):
+        # Leave raising the error for an unknown type up to Bravado, when there actually is a value.
+        return partial(validate_schema_object, swagger_spec, schema_object_spec)
+    elif validation_engine == VALIDATION_ENGINE_COMPILED:
+        return generate_schema_validator(swagger_spec, schema_object_spec, _jsonschema_validator)
+    return _jsonschema_validator(swagger_spec, schema_object_spec)
+
+
+def compile_scalar_param_validator(swagger_spec, param_spec):
+    """
+    Build a validator for a simple scalar (string, integer, number or boolean) path, query, header or form
+    parameter that checks the value with plain comparisons, instead of going through jsonschema.
+
+    Only parameters using nothing but ``type``, a format without a format checker, ``enum``, ``minimum``,
+    ``maximum``, ``exclusiveMinimum``, ``exclusiveMaximum``, ``minLength``, ``maxLength`` and ``pattern`` are
+    supported.
+
+    :param swagger_spec: The Bravado Core spec the parameter belongs to.
+    :type swagger_spec: bravado_core.spec.Spec
+    :param param_spec: The (dereferenced) parameter spec.
+    :type param_spec: dict
+    :return: A callable taking a (cast) value and raising a ``jsonschema.ValidationError`` if it is invalid, or None
+        if the parameter is not simple enough.
+    :rtype: (object -> NoneType) | NoneType
+    """
+    param_type = param_spec.get('type')
+    if param_spec.get('in') not in SCALAR_PARAM_LOCATIONS or param_type not in SCALAR_PARAM_TYPES:
+        return None
+    elif any(key not in SCALAR_PARAM_KEYWORDS and not key.startswith('x-') for key in param_spec):
+        return None
+    elif param_spec.get('x-sensitive') or param_spec.get('format') in swagger_spec.format_checker.checkers:
+        return None
+
+    name = param_spec['name']
+    required = param_spec.get('required', False)
+    python_types = SCALAR_PARAM_TYPES[param_type]
+    enum = param_spec.get('enum')
+    # Like jsonschema, ignore the keywords that don't apply to the type (which is checked first).
+    minimum = maximum = min_length = max_length = pattern = None
+    if param_type in ('integer', 'number'):
+        minimum = param_spec.get('minimum')
+        maximum = param_spec.get('maximum')
+    elif param_type == 'string':
+        min_length = param_spec.get('minLength')
+        max_length = param_spec.get('maxLength')
+        pattern = re.compile(param_spec['pattern']) if 'pattern' in param_spec else None
+    exclusive_minimum = param_spec.get('exclusiveMinimum', False)
+    exclusive_maximum = param_spec.get('exclusiveMaximum', False)
+
+    def invalid(message, keyword, value):
+        return ValidationError(
+            message, validator=keyword, validator_value=param_spec.get(keyword), instance=value, schema=param_spec
+        )
+
+    def validate_scalar_param(value):
+        if value is None:
+            if required:
+                raise invalid("{0} is a required parameter.".format(name), 'required', value)
+            return
+        if not isinstance(value, python_types) or (param_type != 'boolean' and isinstance(value, bool)):
+            raise invalid("{0!r} is not of type {1!r}".format(value, param_type), 'type', value)
+        if enum is not None and value not in enum:
+            raise invalid("{0!r} is not one of {1!r}".format(value, enum), 'enum', value)
+        if minimum is not None and (value <= minimum if exclusive_minimum else value < minimum):
+            raise invalid("{0!r} is less than the minimum of {1!r}".format(value, minimum), 'minimum', value)
+        if maximum is not None and (value >= maximum if exclusive_maximum else value > maximum):
+            raise invalid("{0!r} is greater than the maximum of {1!r}".format(value, maximum), 'maximum', value)
+        if min_length is not None and len(value) < min_length:
+            raise invalid("{0!r} is too short".format(value), 'minLength', value)
+        if max_length is not None and len(value) > max_length:
+            raise invalid("{0!r} is too long".format(value), 'maxLength', value)
+        if pattern is not None and not pattern.search(value):
+            raise invalid("{0!r} does not match {1!r}".format(value, pattern.pattern), 'pattern', value)
+
+    return validate_scalar_param
+
+
+class RequestBodyTooLarge(Exception):
+    """
+    Raised when the body of a request is larger than its operation allows.
+    """
+    def __init__(self, length, max_length, message=None):
+        super(RequestBodyTooLarge, self).__init__(
+            message or "Request body of {0} bytes exceeds the limit of {1} bytes".format(length, max_length)
+        )
+        self.length = length
+        self.max_length = max_length
+
+
+class UnsupportedMediaType(Exception):
+    """
+    Raised when the body of a request has a content type its operation doesn't consume.
+    """
+    def __init__(self, content_type, consumes):
+        super(UnsupportedMediaType, self).__init__(
+            "Request content-type '{0}' is not one of {1}".format(content_type, ", ".join(sorted(consumes)))
+        )
+        self.content_type = content_type
+        self.consumes = consumes
+
+
+class UploadTooLarge(RequestBodyTooLarge):
+    """
+    Raised when a file uploaded in a multipart request is larger than its parameter allows.
+    """
+    def __init__(self, name, length, max_length):
+        super(UploadTooLarge, self).__init__(
+            length, max_length, "Uploaded file '{0}' of (at least) {1} bytes exceeds the limit of {2} bytes".format(
+                name, length, max_length
+            )
+        )
+        self.name = name
+
+
+class MalformedRequestBody(ValueError):
+    """
+    Raised when a request body can't be decoded: a malformed chunked or multipart/form-data body.
+    """
+
+
+def _media_type(content_type):
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def _media_type_matches(media_type, media_types):
+    return media_type in media_types or '*/*' in media_types or media_type.split('/', 1)[0] + '/*' in media_types
+
+
+def _iter_chunked_body(read, bufsize):
+    # Decodes a body sent with "Transfer-Encoding: chunked", in pieces of at most bufsize bytes.
+    while True:
+        header = read(1)
+        while header[-2:] != b'\r\n':
+            char = read(1)
+            if not char or len(header) > bufsize:
+                raise MalformedRequestBody('Invalid chunked body')
+            header += char
+        try:
+            size = int(header.split(b';', 1)[0].strip(), 16)
+        except ValueError:
+            raise MalformedRequestBody('Invalid chunked body')
+        if not size:
+            return
+        while size > 0:
+            part = read(min(size, bufsize))
+            if not part:
+                raise MalformedRequestBody('Invalid chunked body')
+            yield part
+            size -= len(part)
+        if read(2) != b'\r\n':
+            raise MalformedRequestBody('Invalid chunked body')
+
+
+HEADER_PARAMETER_PATTERN = re.compile(r';\s*([^\s;=]+)\s*=\s*("(?:\\.|[^"\\])*"|[^;]*)')
+
+
+def _header_parameters(value):
+    """
+    :return: The parameters of a header value such as ``form-data; name="field"``, keyed by (lowercase) name.
+    :rtype: dict
+    """
+    parameters = {}
+    for name, parameter in HEADER_PARAMETER_PATTERN.findall(value):
+        parameter = parameter.strip()
+        if parameter[:1] == '"':
+            parameter = re.sub(r'\\(.)', r'\1', parameter[1:-1])
+        parameters[name.lower()] = parameter
+    return parameters
+
+
+class StreamedBodyValidationError(ValidationError):
+    """
+    Raised (to the route callback, which should let it through) by the iterator over a streamed
+    request body when one of its items is invalid. The plugin turns it into an invalid request.
+    """
+
+
+def unmarshal_lazily(swagger_spec, schema_object_spec, value):
+    """
+    Unmarshal a (validated) value like ``bravado_core.unmarshal.unmarshal_schema_object``, except that plain
+    objects (including the items of arrays) are wrapped in a ``LazyModel`` rather than unmarshalled
+    (recursively) right away.
+
+    :param swagger_spec: The Bravado Core spec the schema object belongs to.
+    :type swagger_spec: bravado_core.spec.Spec
+    :param schema_object_spec: The schema object of the value.
+    :type schema_object_spec: dict
+    :param value: The value to unmarshal.
+    :return: The unmarshalled value, or a LazyModel.
+    """
+    schema_object_spec = swagger_spec.deref(schema_object_spec)
+    if (
+        isinstance(value, dict) and is_object(swagger_spec, schema_object_spec) and
+        'discriminator' not in schema_object_spec and 'allOf' not in schema_object_spec
+    ):
+        return LazyModel(swagger_spec, schema_object_spec, value)
+    elif isinstance(value, list) and schema_object_spec.get('type') == 'array' and 'items' in schema_object_spec:
+        items_spec = swagger_spec.deref(schema_object_spec['items'])
+        return [unmarshal_lazily(swagger_spec, items_spec, item) for item in value]
+    return unmarshal_schema_object(swagger_spec, schema_object_spec, value)
+
+
+class LazyModel(object):
+    """
+    A stand-in for the Bravado model (or dictionary) of a validated request body object, only unmarshalling
+    its properties as they are accessed (see the ``lazy_unmarshalling`` option of ``SwaggerPlugin``). Nested
+    objects are LazyModels in turn.
+
+    Properties can be read as attributes or items, as on a model. ``get``, ``keys`` and ``items`` work as on a
+    dictionary, unless the object has properties of these names. ``_materialize()`` returns the actual
+    Bravado model (or dictionary).
+    """
+    __slots__ = ('_swagger_spec', '_schema', '_raw', '_values')
+
+    # Only looked up for the names no property takes.
+    DICT_METHODS = {'get': '_get', 'keys': '_keys', 'items': '_items'}
+
+    def __init__(self, swagger_spec, schema_object_spec, raw_value):
+        self._swagger_spec = swagger_spec
+        self._schema = schema_object_spec
+        self._raw = raw_value
+        self._values = {}
+
+    def __getitem__(self, name):
+        values = self._values
+        if name in values:
+            return values[name]
+        value = values[name] = self._unmarshal_property(name)
+        return value
+
+    def __getattr__(self, name):
+        # Only called for names that aren't slots or methods.
+        if name.startswith('__'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            if name in self.DICT_METHODS:
+                return getattr(self, self.DICT_METHODS[name])
+            raise AttributeError("{0} has no property {1!r}".format(self.__class__.__name__, name))
+
+    def __contains__(self, name):
+        return name in self._raw or name in self._missing_properties()
+
+    def __iter__(self):
+        for name in self._raw:
+            yield name
+        for name in self._missing_properties():
+            yield name
+
+    def __len__(self):
+        return len(self._raw) + len(self._missing_properties())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyModel):
+            other = other._materialize()
+        return self._materialize() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
 
     def __repr__(self):
-        return repr(self._core_op)
+        return "{0}({1!r})".format(self.__class__.__name__, self._raw)
 
-    @property
-    def security_specs(self):
-        return []
+    def _get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
 
-    @property
-    def security_requirements(self):
-        return []
+    def _keys(self):
+        return list(self)
 
-    def __getattr__(self, item):
-        return getattr(self._core_op, item)
+    def _items(self):
+        return [(name, self[name]) for name in self]
 
-    def __setattr__(self, key, value):
-        if key == "_core_op":
-            self.__dict__[key] = value
+    def _materialize(self):
+        """
+        :return: The Bravado model (or dictionary) the object unmarshals to.
+        """
+        return unmarshal_schema_object(self._swagger_spec, self._schema, self._raw)
+
+    def _missing_properties(self):
+        if not self._swagger_spec.config['include_missing_properties']:
+            return ()
+        return [name for name in self._schema.get('properties') or {} if name not in self._raw]
+
+    def _unmarshal_property(self, name):
+        # Mirrors bravado_core.unmarshal._unmarshal_object, for one property.
+        swagger_spec = self._swagger_spec
+        deref = swagger_spec.deref
+        property_spec = deref((self._schema.get('properties') or {}).get(name))
+        if name not in self._raw:
+            if property_spec is None or not swagger_spec.config['include_missing_properties']:
+                raise KeyError(name)
+            elif swagger_spec.config['use_models'] and MODEL_MARKER in self._schema:
+                # Bravado's models set their missing properties to None before the defaults are considered.
+                return None
+            default = get_default(swagger_spec, property_spec)
+            return None if default is None else unmarshal_schema_object(swagger_spec, property_spec, default)
+
+        value = self._raw[name]
+        if property_spec is None:
+            property_spec = deref(self._schema.get('additionalProperties', True))
+            if not isinstance(property_spec, dict):
+                return value
+        return unmarshal_lazily(swagger_spec, property_spec, value)
+
+
+class SwaggerParamPlan(object):
+    """
+    A single parameter of a Swagger operation, with everything needed to unmarshal
+    it from a request (including its validator) worked out ahead of time.
+
+    Users should not need to consume this directly.
+    """
+    def __init__(self, param, validate=True, validation_engine=VALIDATION_ENGINE_JSONSCHEMA, stream=False,
+                 lazy=False, stream_uploads=False):
+        swagger_spec = param.swagger_spec
+        deref = swagger_spec.deref
+        self.swagger_spec = swagger_spec
+        self.name = param.name
+        self.location = param.location
+        self.required = param.required
+        self.param_spec = deref(get_param_type_spec(param))
+        self.param_type = deref(self.param_spec.get('type'))
+        self.default = get_default(swagger_spec, self.param_spec)
+        self.validator = None
+        if validate:
+            self.validator = (
+                compile_scalar_param_validator(swagger_spec, self.param_spec) or
+                compile_schema_validator(swagger_spec, self.param_spec, validation_engine)
+            )
+        # Scalars without a format converting them come out of the request just as they are unmarshalled.
+        format_name = self.param_spec.get('format')
+        self.unmarshal_scalar_as_is = self.param_type in SWAGGER_PRIMITIVES and (
+            format_name is None or swagger_spec.get_format(format_name) is None
+        )
+        # Array bodies may be handed to the route callback as an iterator, validating the items one at a time.
+        self.stream = stream and self.location == 'body' and self.param_type == 'array'
+        self.items_spec = None
+        self.items_validator = None
+        # Body objects may be handed over as LazyModels, unmarshalling their properties as they are accessed.
+        self.lazy = lazy and self.location == 'body'
+        if self.stream:
+            self.items_spec = deref(self.param_spec.get('items')) or {}
+            if validate:
+                self.items_validator = compile_schema_validator(swagger_spec, self.items_spec, validation_engine)
+        # Uploaded files may be limited in size (always) and content type (when validating) by vendor extensions.
+        self.max_file_bytes = None
+        self.file_content_types = None
+        if self.param_type == 'file':
+            self.max_file_bytes = self.param_spec.get('x-max-file-bytes')
+            if validate:
+                self.file_content_types = frozenset(
+                    _media_type(content_type) for content_type in self.param_spec.get('x-content-types', ())
+                ) or None
+        # Streamed uploads are checked as they are read, rather than once more afterwards.
+        self.check_uploads = not stream_uploads and (
+            self.max_file_bytes is not None or self.file_content_types is not None
+        )
+
+    def __repr__(self):
+        return "{}({!r}, {!r})".format(self.__class__.__name__, self.location, self.name)
+
+    def unmarshal(self, incoming_request):
+        # Mirrors bravado_core.param.unmarshal_param, minus building the validator.
+        location = self.location
+        if location == 'path':
+            raw_value = cast_request_param(self.param_type, self.name, incoming_request.path.get(self.name, None))
+        elif location == 'query':
+            raw_value = cast_request_param(
+                self.param_type, self.name, incoming_request.query.get(self.name, self.default)
+            )
+        elif location == 'header':
+            raw_value = cast_request_param(
+                self.param_type, self.name, incoming_request.headers.get(self.name, self.default)
+            )
+        elif location == 'formData':
+            if self.param_type == 'file':
+                raw_value = incoming_request.files.get(self.name, None)
+                if raw_value is not None and self.check_uploads:
+                    self.check_upload(raw_value)
+            else:
+                raw_value = cast_request_param(
+                    self.param_type, self.name, incoming_request.form.get(self.name, self.default)
+                )
+        elif location == 'body':
+            if self.stream:
+                return self.unmarshal_stream(incoming_request)
+            try:
+                raw_value = incoming_request.json()
+            except ValueError as json_error:
+                if self.required:
+                    raise SwaggerMappingError("Error reading request body JSON: {0}".format(str(json_error)))
+                raw_value = self.default
         else:
-            return setattr(self._core_op, key, value)
+            raise SwaggerMappingError("Don't know how to unmarshal_param with location {0}".format(location))
+
+        if raw_value is None and not self.required:
+            return None
+
+        if self.param_type == 'array' and location != 'body':
+            raw_value = unmarshal_collection_format(self.swagger_spec, self.param_spec, raw_value)
+
+        if self.validator is not None:
+            self.validator(raw_value)
+
+        return self.unmarshal_value(raw_value)
+
+    def unmarshal_value(self, raw_value):
+        if self.unmarshal_scalar_as_is and raw_value is not None:
+            return raw_value
+        elif self.lazy:
+            return unmarshal_lazily(self.swagger_spec, self.param_spec, raw_value)
+        return unmarshal_schema_object(self.swagger_spec, self.param_spec, raw_value)
+
+    def check_upload_type(self, content_type):
+        """
+        :raises UnsupportedMediaType: If the content type of a file isn't one this parameter accepts.
+        """
+        if self.file_content_types is not None:
+            content_type = _media_type(content_type or '')
+            if not _media_type_matches(content_type, self.file_content_types):
+                raise UnsupportedMediaType(content_type, self.file_content_types)
+
+    def check_upload(self, upload):
+        """
+        Check a file uploaded for this parameter against the content types and size it accepts.
+
+        :type upload: bottle.FileUpload
+        :raises UnsupportedMediaType: If the file has a content type the parameter doesn't accept.
+        :raises UploadTooLarge: If the file is larger than the parameter allows.
+        """
+        self.check_upload_type(upload.content_type)
+        if self.max_file_bytes is not None:
+            upload.file.seek(0, os.SEEK_END)
+            length = upload.file.tell()
+            upload.file.seek(0)
+            if length > self.max_file_bytes:
+                raise UploadTooLarge(self.name, length, self.max_file_bytes)
+
+    def unmarshal_stream(self, incoming_request):
+        """
+        Unmarshal a streamed array body: the items are only read, validated and unmarshalled as
+        the returned iterator is consumed. Anything but a JSON array is handled as a regular body.
+
+        :rtype: iterator | object
+        """
+        reader = incoming_request.json_array_reader()
+        if reader is not None and reader.is_array:
+            return self._unmarshal_items(reader)
+
+        raw_value = reader.remainder() if reader is not None else None
+        if raw_value is None:
+            raw_value = self.default
+            if raw_value is None and not self.required:
+                return None
+        if self.validator is not None:
+            self.validator(raw_value)
+        return self.unmarshal_value(raw_value)
+
+    def _unmarshal_items(self, reader):
+        validate = self.validator is not None
+        max_items = self.param_spec.get('maxItems')
+        count = 0
+        for item in reader:
+            if validate:
+                if max_items is not None and count >= max_items:
+                    raise StreamedBodyValidationError(
+                        "{0} has more than {1} items".format(self.name, max_items),
+                        validator='maxItems', validator_value=max_items, schema=self.param_spec
+                    )
+                if self.items_validator is not None:
+                    try:
+                        self.items_validator(item)
+                    except ValidationError as e:
+                        e.path.appendleft(count)
+                        raise StreamedBodyValidationError.create_from(e)
+            count += 1
+            if self.lazy:
+                yield unmarshal_lazily(self.swagger_spec, self.items_spec, item)
+            else:
+                yield unmarshal_schema_object(self.swagger_spec, self.items_spec, item)
+
+        min_items = self.param_spec.get('minItems')
+        if validate and min_items is not None and count < min_items:
+            raise StreamedBodyValidationError(
+                "{0} has fewer than {1} items".format(self.name, min_items),
+                validator='minItems', validator_value=min_items, schema=self.param_spec
+            )
+
+
+class SwaggerResponsePlan(object):
+    """
+    A single (status code) response of a Swagger operation, with the validators for
+    its body and headers built ahead of time.
+
+    Users should not need to consume this directly.
+    """
+    def __init__(self, swagger_op, response_spec, validate=True, validation_engine=VALIDATION_ENGINE_JSONSCHEMA):
+        swagger_spec = swagger_op.swagger_spec
+        deref = swagger_spec.deref
+        self.produces = swagger_op.produces
+        self.body_spec = deref(response_spec.get('schema'))
+        self.body_validator = None
+        if validate and self.body_spec is not None:
+            self.body_validator = compile_schema_validator(swagger_spec, self.body_spec, validation_engine)
+        # For array bodies, what each item of a streamed response is validated against.
+        self.items_spec = None
+        self.items_validator = None
+        if self.body_spec is not None and deref(self.body_spec.get('type')) == 'array':
+            self.items_spec = deref(self.body_spec.get('items')) or {}
+            if validate:
+                self.items_validator = compile_schema_validator(swagger_spec, self.items_spec, validation_engine)
+        self.header_validators = []
+        if validate:
+            for header_name, header_spec in (deref(response_spec.get('headers')) or {}).items():
+                header_validator = compile_schema_validator(swagger_spec, deref(header_spec), validation_engine)
+                if header_validator is not None:
+                    self.header_validators.append((header_name, header_validator))
+
+    def validate(self, outgoing_response):
+        # Mirrors bravado_core.response.validate_response, minus building the validators.
+        self.validate_body(outgoing_response)
+        self.validate_headers(outgoing_response)
+
+    def validate_body(self, outgoing_response):
+        if self.body_spec is None:
+            if outgoing_response.text not in EMPTY_BODIES:
+                raise SwaggerMappingError("Response body should be empty: {0}".format(outgoing_response.text))
+        else:
+            content_type = outgoing_response.content_type
+            if content_type not in self.produces:
+                raise SwaggerMappingError(
+                    "Response content-type '{0}' is not supported by the Swagger "
+                    "specification's content-types '{1}".format(content_type, self.produces)
+                )
+            if content_type == APP_JSON or content_type == APP_MSGPACK:
+                if content_type == APP_JSON:
+                    response_value = outgoing_response.json()
+                else:
+                    # Only needed (and imported) for msgpack responses; it isn't one of our own dependencies.
+                    import msgpack
+                    response_value = msgpack.loads(outgoing_response.raw_bytes, raw=False)
+                if self.body_validator is not None:
+                    self.body_validator(response_value)
+            elif not content_type.startswith("text/"):
+                raise SwaggerMappingError("Unsupported content-type in response: {0}".format(content_type))
+
+    def validate_headers(self, outgoing_response):
+        for header_name, header_validator in self.header_validators:
+            try:
+                header_validator(outgoing_response.headers.get(header_name))
+            except ValidationError as e:
+                e.message = "{0} for header '{1}'".format(e.message, header_name)
+                raise e
+
+
+class SwaggerOperationPlan(object):
+    """
+    Everything the plugin needs to know about a single Swagger operation, worked
+    out once when the plugin is first applied to a route for that operation: the
+    parameters and responses with their precompiled validators, the security
+    requirements and the response validation sample rate. With the "compiled" validation engine, requests and
+    responses are handled by functions generated for the operation instead.
+
+    Users should not need to consume this directly.
+    """
+    def __init__(self, swagger_op, response_sample_rate=1.0, validate_security=True,
+                 validation_engine=VALIDATION_ENGINE_JSONSCHEMA, stream_body=False, max_body_bytes=None,
+                 check_content_type=False, security_verifiers=None, lazy_unmarshalling=False, stream_uploads=False):
+        swagger_spec = swagger_op.swagger_spec
+        deref = swagger_spec.deref
+        self.swagger_op = swagger_op
+        self.operation_id = swagger_op.operation_id
+        self.response_sample_rate = response_sample_rate
+        self.security = None
+        self.credentials = None
+        if validate_security:
+            security = SwaggerSecurityPlan(swagger_op, security_verifiers)
+            if security.checks_api_keys and swagger_spec.config['validate_requests']:
+                self.security = security
+            if security.credential_checks is not None:
+                self.credentials = security
+        self.validate_security = self.security is not None
+
+        validate_requests = swagger_spec.config['validate_requests']
+        self.params = [
+            SwaggerParamPlan(
+                param, validate=validate_requests, validation_engine=validation_engine, stream=stream_body,
+                lazy=lazy_unmarshalling, stream_uploads=stream_uploads
+            )
+            for param in swagger_op.params.values()
+        ]
+
+        validate_responses = response_sample_rate > 0.0
+        self.responses = {}
+        for status, response_spec in deref(deref(swagger_op.op_spec).get('responses', {})).items():
+            if not str(status).startswith('x-'):
+                self.responses[str(status)] = SwaggerResponsePlan(
+                    swagger_op, deref(response_spec), validate=validate_responses, validation_engine=validation_engine
+                )
+        self.default_response = self.responses.get('default')
+
+        # The parts of the request the parameters are read from; the others are never parsed.
+        self.locations = frozenset(param_plan.location for param_plan in self.params)
+
+        # Checked against the request headers, before the body is read at all.
+        self.max_body_bytes = deref(swagger_op.op_spec).get('x-max-body-bytes', max_body_bytes)
+        self.consumes = None
+        if check_content_type and validate_requests and ('body' in self.locations or 'formData' in self.locations):
+            self.consumes = frozenset(_media_type(content_type) for content_type in swagger_op.consumes) or None
+        self.check_body = self.max_body_bytes is not None or self.consumes is not None
+
+        # Multipart bodies may be read part by part, checking the uploads (and fields) as they arrive.
+        self.form_params = None
+        if stream_uploads and 'formData' in self.locations:
+            self.form_params = dict(
+                (param_plan.name, param_plan) for param_plan in self.params if param_plan.location == 'formData'
+            )
+        self.stream_uploads = self.form_params is not None
+        # Whether the whole body is parsed (and validated) before the route callback is called.
+        self.parses_body = ('body' in self.locations or 'formData' in self.locations) and not (
+            self.stream_uploads or any(param_plan.stream for param_plan in self.params)
+        )
+
+        self.request_unmarshaller = None
+        self.response_validator = None
+        if validation_engine == VALIDATION_ENGINE_COMPILED:
+            self.request_unmarshaller = generate_request_unmarshaller(self)
+            self.response_validator = generate_response_validator(self)
+
+    def __repr__(self):
+        return "{}({!r})".format(self.__class__.__name__, self.swagger_op)
+
+    def unmarshal_request(self, incoming_request):
+        """
+        Unmarshal (and validate) the parameters of a request for this operation.
+
+        :param incoming_request: The request to unmarshal.
+        :type incoming_request: bravado_core.request.IncomingRequest
+        :return: The unmarshalled parameters, keyed by name.
+        :rtype: dict
+        """
+        if self.request_unmarshaller is not None:
+            return self.request_unmarshaller(incoming_request)
+
+        request_data = {}
+        for param_plan in self.params:
+            request_data[param_plan.name] = param_plan.unmarshal(incoming_request)
+        if self.validate_security:
+            self.check_security(request_data)
+        return request_data
+
+    def check_request_body(self, bottle_request):
+        """
+        Check the size and content type of a request body for this operation, without parsing it. The size is
+        taken from the Content-Length header; a chunked body is read (for Bottle) up to the limit, and no further.
+
+        :param bottle_request: The request to check.
+        :type bottle_request: bottle.BaseRequest
+        :raises RequestBodyTooLarge: If the body is larger than the operation allows.
+        :raises UnsupportedMediaType: If the operation doesn't consume the content type of the body.
+        """
+        environ = bottle_request.environ
+        chunked = 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower()
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if not length and not chunked:
+            return
+
+        if self.max_body_bytes is not None:
+            if chunked and not ('body' in self.locations or 'formData' in self.locations):
+                # There is no way to tell its size without reading it, and it won't be parsed anyway.
+                return
+            elif chunked:
+                length = self._read_chunked_body(bottle_request, self.max_body_bytes)
+            if length > self.max_body_bytes:
+                raise RequestBodyTooLarge(length, self.max_body_bytes)
+
+        consumes = self.consumes
+        if consumes is not None:
+            content_type = _media_type(environ.get('CONTENT_TYPE', ''))
+            if not _media_type_matches(content_type, consumes):
+                raise UnsupportedMediaType(content_type, consumes)
+
+    @staticmethod
+    def _read_chunked_body(bottle_request, max_length):
+        """
+        Read (and decode) a chunked request body the way Bottle's ``request.body`` does, spooling large ones to a
+        temporary file, but give up as soon as it runs past ``max_length`` bytes.
+
+        :return: The length of the body.
+        :rtype: int
+        :raises RequestBodyTooLarge: If the body is longer than ``max_length``.
+        :raises MalformedRequestBody: If the body isn't validly chunked.
+        """
+        environ = bottle_request.environ
+        if 'bottle.request.body' in environ:
+            body = environ['bottle.request.body']
+            body.seek(0, os.SEEK_END)
+            length = body.tell()
+            body.seek(0)
+            return length
+
+        memfile_max = bottle_request.MEMFILE_MAX
+        body = tempfile.SpooledTemporaryFile(max_size=memfile_max)
+        length = 0
+        for part in _iter_chunked_body(environ['wsgi.input'].read, memfile_max):
+            length += len(part)
+            if length > max_length:
+                body.close()
+                raise RequestBodyTooLarge(length, max_length)
+            body.write(part)
+        body.seek(0)
+        environ['wsgi.input'] = environ['bottle.request.body'] = body
+        return length
+
+    def read_multipart(self, bottle_request):
+        """
+        Read a multipart/form-data request body for this operation part by part, straight from the WSGI input. The
+        file parts are checked against the content types and size limit of their parameter as their headers (and
+        then each chunk) arrive, and spooled to temporary files; the other fields are validated as soon as they are
+        complete. The parts are then left to Bottle as its parsed ``forms`` and ``files``, but the raw body can't
+        be read anymore. Bodies of other content types are left alone.
+
+        :param bottle_request: The request to read.
+        :type bottle_request: bottle.BaseRequest
+        :raises UploadTooLarge: If a file is larger than its parameter allows.
+        :raises UnsupportedMediaType: If a file has a content type its parameter doesn't accept.
+        :raises RequestBodyTooLarge: If a field is larger than Bottle's ``MEMFILE_MAX``.
+        :raises MalformedRequestBody: If the body isn't a valid multipart body.
+        :raises jsonschema.ValidationError: If a field is invalid.
+        """
+        environ = bottle_request.environ
+        content_type = environ.get('CONTENT_TYPE', '')
+        if _media_type(content_type) != 'multipart/form-data' or 'bottle.request.post' in environ:
+            return
+        options = _header_parameters(content_type)
+        boundary = options.get('boundary')
+        if not boundary:
+            raise MalformedRequestBody('Invalid multipart body')
+        charset = options.get('charset', 'utf8')
+
+        if 'bottle.request.body' in environ or bottle_request.chunked:
+            # Already read (or to be decoded) by Bottle.
+            body, length = bottle_request.body, None
+        else:
+            body, length = environ['wsgi.input'], max(bottle_request.content_length, 0)
+            environ['bottle.request.body'] = BytesIO()
+
+        memfile_max = bottle_request.MEMFILE_MAX
+        post, forms, files = FormsDict(), FormsDict(), FormsDict()
+        post.recode_unicode = forms.recode_unicode = files.recode_unicode = False
+        for part in MultipartReader(body, boundary.encode('latin1'), length).parts():
+            if part.name is None:
+                raise MalformedRequestBody('Invalid multipart body')
+            param_plan = self.form_params.get(part.name)
+            if part.filename:
+                post[part.name] = files[part.name] = self._spool_upload(part, param_plan, memfile_max)
+                continue
+            try:
+                value = part.read(memfile_max).decode(charset)
+            except UnicodeDecodeError:
+                raise MalformedRequestBody('Invalid multipart body')
+            post[part.name] = forms[part.name] = value
+            if param_plan is not None and param_plan.validator is not None and \
+                    param_plan.param_type not in ('array', 'file'):
+                param_plan.validator(cast_request_param(param_plan.param_type, part.name, value))
+        environ['bottle.request.post'] = post
+        environ['bottle.request.forms'] = forms
+        environ['bottle.request.files'] = files
+
+    @staticmethod
+    def _spool_upload(part, param_plan, memfile_max):
+        max_length = None
+        if param_plan is not None:
+            param_plan.check_upload_type(part.content_type)
+            max_length = param_plan.max_file_bytes
+        spooled = tempfile.SpooledTemporaryFile(max_size=memfile_max)
+        length = 0
+        for chunk in part:
+            length += len(chunk)
+            if max_length is not None and length > max_length:
+                spooled.close()
+                raise UploadTooLarge(part.name, length, max_length)
+            spooled.write(chunk)
+        spooled.seek(0)
+        return FileUpload(spooled, part.name, part.filename, part.headerlist)
+
+    def check_security(self, request_data):
+        self.security.check(request_data)
+
+    def verify_credentials(self, bottle_request, request_data, cache=None):
+        """
+        :return: The principal the credentials of the request were verified as (see ``SwaggerSecurityPlan.verify``),
+            or None if the operation has no security verifiers.
+        """
+        if self.credentials is None:
+            return None
+        return self.credentials.verify(bottle_request, request_data, cache)
+
+    def response_plan(self, status_code):
+        """
+        :param status_code: The HTTP status code of the response.
+        :type status_code: int
+        :return: The plan for the response spec matching the given status code.
+        :rtype: SwaggerResponsePlan
+        :raises MatchingResponseNotFound: If neither the status code nor a default response is specified.
+        """
+        response_plan = self.responses.get(str(status_code), self.default_response)
+        if response_plan is None:
+            raise MatchingResponseNotFound(
+                "Response specification matching http status_code {0} not found "
+                "for operation {1}. Either add a response specification for the "
+                "status_code or use a `default` response.".format(status_code, self.swagger_op)
+            )
+        return response_plan
+
+    def validate_response(self, status_code, outgoing_response):
+        """
+        Validate an outgoing response for this operation.
+
+        :param status_code: The HTTP status code of the response.
+        :type status_code: int
+        :param outgoing_response: The response to validate.
+        :type outgoing_response: bravado_core.response.OutgoingResponse
+        """
+        if self.response_validator is not None:
+            return self.response_validator(status_code, outgoing_response)
+        self.response_plan(status_code).validate(outgoing_response)
+
+
+class SwaggerMetrics(object):
+    """
+    The default, in-process aggregator for the metrics reported by the plugin (see the ``metrics`` option of
+    ``SwaggerPlugin``): the number, total and maximum duration of every request phase, and the number of
+    validation failures, not found routes and exceptions, per operation id.
+
+    Anything with the same ``observe`` and ``increment`` methods can be used instead, e.g. to forward the
+    metrics to Prometheus or StatsD. Both are called on the request thread, so they should be cheap and
+    must not raise.
+
+        >>> metrics = SwaggerMetrics()
+        >>> my_app.install(SwaggerPlugin(my_swagger_def, metrics=metrics))
+        >>> metrics.snapshot()['phases']['get_thing']['handler']
+        {'count': 12, 'total': 0.0042, 'max': 0.0011}
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._counters = {}
+
+    def observe(self, operation_id, phase, seconds):
+        """
+        Record the duration of a phase of a request.
+
+        :param operation_id: The operation id of the request.
+        :type operation_id: str
+        :param phase: One of "request_validation", "handler", "response_validation", "serialization" or "total".
+        :type phase: str
+        :param seconds: The duration of the phase.
+        :type seconds: float
+        """
+        key = (operation_id, phase)
+        with self._lock:
+            stats = self._phases.get(key)
+            if stats is None:
+                self._phases[key] = [1, seconds, seconds]
+            else:
+                stats[0] += 1
+                stats[1] += seconds
+                if seconds > stats[2]:
+                    stats[2] = seconds
+
+    def increment(self, operation_id, counter):
+        """
+        Count an event.
+
+        :param operation_id: The operation id of the request, or None for requests to routes not found in the
+            Swagger spec.
+        :type operation_id: str | NoneType
+        :param counter: One of "invalid_request", "invalid_security", "invalid_response", "not_found" or
+            "exception".
+        :type counter: str
+        """
+        key = (operation_id, counter)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def snapshot(self):
+        """
+        :return: A copy of the metrics so far, as ``{"phases": {operation id: {phase: {"count", "total", "max"}}},
+            "counters": {operation id: {counter: count}}}``.
+        :rtype: dict
+        """
+        with self._lock:
+            phases, counters = dict(self._phases), dict(self._counters)
+        snapshot = {'phases': {}, 'counters': {}}
+        for (operation_id, phase), (count, total, maximum) in phases.items():
+            snapshot['phases'].setdefault(operation_id, {})[phase] = {'count': count, 'total': total, 'max': maximum}
+        for (operation_id, counter), count in counters.items():
+            snapshot['counters'].setdefault(operation_id, {})[counter] = count
+        return snapshot
+
+    def reset(self):
+        with self._lock:
+            self._phases.clear()
+            self._counters.clear()
 
 
 class SwaggerPlugin(object):
@@ -157,8 +1639,27 @@ class SwaggerPlugin(object):
     * ``validate_swagger_spec`` -- (bool) Should plugin validate the given Swagger specification?
     * ``validate_requests`` -- (bool) Should the plugin validate incoming requests for defined Swagger routes?
     * ``validate_responses`` -- (bool) Should the plugin validate outoging requests for defined Swagger routes?
+    * ``response_validation_sample_rate`` -- (float) The fraction of responses (0.0 to 1.0) that are validated.
+    * ``response_validation_sample_rates`` -- (dict) Sample rates overriding ``response_validation_sample_rate``,
+        keyed by operation id or tag.
+    * ``response_validation_time_budget`` -- (float) The maximum number of seconds per second spent validating
+        responses. Once it is spent, responses are not validated until the next second.
+    * ``enforce_response_validation`` -- (bool) Should invalid responses trigger the ``invalid_response_handler``?
+        If not, they are only logged.
+    * ``validation_engine`` -- (str) "jsonschema" to validate with (precompiled) jsonschema validators, or
+        "compiled" to validate with Python code generated for each operation.
+    * ``streamed_request_bodies`` -- (list) Operation ids or tags of the operations whose JSON array bodies are
+        handed to the route callbacks as an iterator, reading and validating the items one at a time.
+    * ``max_request_body_bytes`` -- (int) The largest request body accepted by operations that don't set their own
+        limit with the ``x-max-body-bytes`` vendor extension.
+    * ``validate_request_content_type`` -- (bool) Should request bodies with a content type their operation doesn't
+        consume be rejected, before they are read?
+    * ``stream_multipart_uploads`` -- (bool) Should multipart bodies be read part by part, checking the uploaded files
+        (against the ``x-max-file-bytes`` and ``x-content-types`` vendor extensions) and fields as they arrive?
     * ``use_bravado_models`` -- (bool) Should the plugin use Bravado's models or raw dictionaries for the swagger_data
         attached to the requests?
+    * ``lazy_unmarshalling`` -- (bool) Should objects in request bodies be handed over as ``LazyModel`` proxies,
+        unmarshalling their properties into models (or dictionaries) only as they are accessed?
     * ``user_defined_formats`` -- (bool) A list of any custom formats (as defined by Bravado-Core) for our Swagger Spec.
     * ``include_missing_properties`` -- (bool) Should we include any missing properties as None?
     * ``default_type_to_object`` -- (bool) If a type isn't given for a Swagger property should it default to "object"?
@@ -167,8 +1668,23 @@ class SwaggerPlugin(object):
         swagger_op_not_found handler?
     * ``ignore_security_definitions`` -- (bool) Should we ignore the security requirements specified in the swagger
         spec? This allows you to use things like Cookie auth as an undocumented fallback without Bravado complaining.
+    * ``security_verifiers`` -- (dict) Functions verifying the credentials of the requests (and returning their
+        principal, attached to the request as ``swagger_principal``), keyed by security definition name.
+    * ``security_cache_size`` -- (int) How many verified credentials to keep, so they aren't verified again on
+        every request. 0 disables the cache.
+    * ``security_cache_ttl`` -- (float) For how many seconds verified credentials are kept.
     * ``auto_jsonify`` -- (bool) Should we automatically convert data returned from our callbacks to JSON? Bottle
-        normally will attempt to convert only objects, but we can do better.
+        normally will attempt to convert only objects, but we can do better. Generators (and other iterators)
+        returned for array responses are streamed out as a JSON array, validating each item as it is written.
+    * ``json_encoder`` -- (object -> bytes | str) The JSON encoder for response bodies, error payloads and the served
+        Swagger schema. Defaults to Bottle's ``json_dumps``.
+    * ``json_decoder`` -- (bytes -> object) The JSON decoder for request bodies. Defaults to Bottle's own parsing.
+    * ``async_callbacks`` -- (bool) Should coroutines returned by (async) route callbacks be run to completion, on an
+        event loop of their own, and their result used as the callback's?
+    * ``validation_executor`` -- (concurrent.futures.Executor) If not None, the executor (e.g. a thread pool) large
+        request bodies and responses are validated on, so the worker (or event loop) handling them isn't stalled.
+    * ``offload_threshold_bytes`` -- (int) The size from which request bodies and responses are validated on the
+        ``validation_executor``.
     * ``invalid_request_handler`` -- (Exception -> HTTP Response) This handler is triggered when the
         request validation fails.
     * ``invalid_response_handler`` -- (Exception -> HTTP Response) This handler is triggered when
@@ -176,6 +1692,10 @@ class SwaggerPlugin(object):
     * ``invalid_security_handler`` -- (Exception -> HTTP Response) This handler is triggered when
         no valid forms of authentication matching the Swagger spec were in the incoming request. This is
         ignored if ``ignore_security_definitions`` is set to True.
+    * ``request_too_large_handler`` -- (Exception -> HTTP Response) This handler is triggered when the
+        request body is larger than its operation allows.
+    * ``unsupported_media_type_handler`` -- (Exception -> HTTP Response) This handler is triggered when the
+        request body has a content type its operation doesn't consume.
     * ``swagger_op_not_found_handler`` -- (bottle.Route -> HTTP Response) This handler is triggered if the
         route isn't found for the API subpath, and ignore_missing_routes has been set True.
     * ``exception_handler`` -- (Base Exception -> HTTP Response.) This handler is triggered if the
@@ -185,13 +1705,29 @@ class SwaggerPlugin(object):
         This is important if your WSGI application is running under a subpath.
     * ``serve_swagger_schema`` -- (bool) Should we serve the Swagger schema?
     * ``swagger_schema_suburl`` -- (str) The subpath in the API to serve the swagger schema.
+    * ``swagger_schema_cache_control`` -- (str) The Cache-Control header sent with the swagger schema.
     * ``serve_swagger_ui`` -- (bool) Should we also serve a copy of Swagger UI?
     * ``swagger_ui_suburl`` -- (str) The subpath from the API to serve the integrate Swagger UI up at.
     * ``swagger_ui_validator_url`` -- (str) The URL for a Swagger spec validator. By default this is None (i.e. off).
+    * ``swagger_ui_assets_cache_control`` -- (str) The Cache-Control header sent with the bundled Swagger UI files,
+        when requested with the Swagger UI version in the query string (``?v=``).
     * ``extra_bravado_config`` -- (object) Any additional Bravado configuration items you may want.
+    * ``spec_cache_dir`` -- (str) A directory to cache the built (validated and dereferenced) Bravado spec in, so
+        that later processes can skip building it.
+    * ``metrics`` -- (SwaggerMetrics) If not None, receives the duration of each phase of every request, and
+        counts of validation failures, not found routes and exceptions, per operation id.
     """
     DEFAULT_SWAGGER_SCHEMA_SUBURL = '/swagger.json'
     DEFAULT_SWAGGER_UI_SUBURL = '/ui/'
+    DEFAULT_SWAGGER_SCHEMA_CACHE_CONTROL = 'no-cache'
+    DEFAULT_SWAGGER_UI_ASSETS_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    MAX_CACHED_SCHEMA_VARIANTS = 32
+    MAX_CACHED_UI_INDEX_VARIANTS = 32
+    # Streamed array responses are written out in chunks of (at least) this many bytes.
+    # Only array responses of operations producing application/json are streamed. An iterator returned for any
+    # other response isn't: it goes through the usual response validation, and is left for Bottle to send.
+    STREAM_CHUNK_SIZE = 64 * 1024
+    DEFAULT_OFFLOAD_THRESHOLD_BYTES = 64 * 1024
 
     name = 'swagger'
     api = 2
@@ -200,28 +1736,52 @@ class SwaggerPlugin(object):
                  validate_swagger_spec=True,
                  validate_requests=True,
                  validate_responses=True,
+                 response_validation_sample_rate=1.0,
+                 response_validation_sample_rates=None,
+                 response_validation_time_budget=None,
+                 enforce_response_validation=True,
+                 validation_engine=VALIDATION_ENGINE_JSONSCHEMA,
+                 streamed_request_bodies=None,
+                 max_request_body_bytes=None,
+                 validate_request_content_type=False,
+                 stream_multipart_uploads=False,
                  use_bravado_models=True,
+                 lazy_unmarshalling=False,
                  user_defined_formats=None,
                  include_missing_properties=True,
                  default_type_to_object=False,
                  internally_dereference_refs=False,
                  ignore_undefined_api_routes=False,
                  ignore_security_definitions=False,
+                 security_verifiers=None,
+                 security_cache_size=0,
+                 security_cache_ttl=60.0,
                  auto_jsonify=True,
+                 json_encoder=None,
+                 json_decoder=None,
+                 async_callbacks=False,
+                 validation_executor=None,
+                 offload_threshold_bytes=DEFAULT_OFFLOAD_THRESHOLD_BYTES,
                  invalid_request_handler=default_bad_request_handler,
                  invalid_response_handler=default_server_error_handler,
                  invalid_security_handler=default_invalid_security_handler,
+                 request_too_large_handler=default_request_too_large_handler,
+                 unsupported_media_type_handler=default_unsupported_media_type_handler,
                  swagger_op_not_found_handler=default_not_found_handler,
                  exception_handler=default_server_error_handler,
                  swagger_base_path=None,
                  adjust_api_base_path=True,
                  serve_swagger_schema=True,
                  swagger_schema_suburl=DEFAULT_SWAGGER_SCHEMA_SUBURL,
+                 swagger_schema_cache_control=DEFAULT_SWAGGER_SCHEMA_CACHE_CONTROL,
                  serve_swagger_ui=False,
                  swagger_ui_schema_url=None,
                  swagger_ui_suburl=DEFAULT_SWAGGER_UI_SUBURL,
                  swagger_ui_validator_url=None,
-                 extra_bravado_config=None):
+                 swagger_ui_assets_cache_control=DEFAULT_SWAGGER_UI_ASSETS_CACHE_CONTROL,
+                 extra_bravado_config=None,
+                 spec_cache_dir=None,
+                 metrics=None):
         """
         Add Swagger validation to your Bottle application.
 
@@ -233,9 +1793,54 @@ class SwaggerPlugin(object):
         :type validate_requests: bool
         :param validate_responses: Should the plugin validate outoging requests for defined Swagger routes?
         :type validate_responses: bool
+        :param response_validation_sample_rate: The fraction of responses (0.0 to 1.0) that are validated, if
+            response validation is on. This allows keeping contract checks on in production without validating
+            every single response.
+        :type response_validation_sample_rate: float
+        :param response_validation_sample_rates: Sample rates overriding ``response_validation_sample_rate`` for
+            specific operations, keyed by operation id or by tag. Operation ids take precedence over tags.
+        :type response_validation_sample_rates: dict
+        :param response_validation_time_budget: If not None, the (approximate) maximum number of seconds per second
+            spent validating responses. Once the budget is spent, responses are not validated until the next second.
+        :type response_validation_time_budget: float | NoneType
+        :param enforce_response_validation: Should invalid responses trigger the ``invalid_response_handler``? If
+            False, invalid responses are logged and sent as they are.
+        :type enforce_response_validation: bool
+        :param validation_engine: How requests and responses are validated: "jsonschema" (the default) uses a
+            jsonschema validator built once for every parameter and response schema; "compiled" generates (and
+            compiles) Python code from the schemas of each operation, which is faster for complex schemas.
+            Schema constructs the generated code doesn't handle itself (e.g. "discriminator") are still checked
+            with jsonschema.
+        :type validation_engine: str
+        :param streamed_request_bodies: Operation ids or tags of the operations whose (array) body parameter is
+            read incrementally: the swagger_data gets an iterator over its items instead of a list, each item being
+            validated as it is reached, so the whole body is never held in memory. An invalid item raises a
+            ``StreamedBodyValidationError`` out of the iterator, which the route callback should let through so the
+            plugin can hand it to the ``invalid_request_handler``. The ``json_decoder`` isn't used for these bodies.
+        :type streamed_request_bodies: list
+        :param max_request_body_bytes: If not None, the largest request body (in bytes) accepted by operations that
+            don't set their own limit with the ``x-max-body-bytes`` vendor extension. Both are checked against the
+            Content-Length header, before the body is read; chunked bodies are read up to the limit, and no further.
+        :type max_request_body_bytes: int | NoneType
+        :param validate_request_content_type: If True (and request validation is on), the Content-Type of requests to
+            operations with body or formData parameters is checked against the operation's ``consumes`` before the
+            body is read, triggering the ``unsupported_media_type_handler`` if it doesn't match.
+        :type validate_request_content_type: bool
+        :param stream_multipart_uploads: If True, multipart/form-data bodies are read part by part, straight from the
+            WSGI input, rather than buffered whole by Bottle first. Files are spooled to temporary files, and
+            rejected as soon as they exceed the ``x-max-file-bytes`` vendor extension of their parameter or don't
+            have one of the content types of its ``x-content-types`` extension; the other fields are validated as
+            soon as they arrive. Bottle's ``request.forms`` and ``request.files`` work as usual, but
+            ``request.body`` is empty. (Both extensions are checked for buffered uploads too, once they are in.)
+        :type stream_multipart_uploads: bool
         :param use_bravado_models: Should the plugin use Bravado's models or raw dictionaries for the swagger_data
             attached to the requests?
         :type use_bravado_models: bool
+        :param lazy_unmarshalling: If True, objects in request bodies are attached to the swagger_data as
+            ``LazyModel`` proxies: they are validated up front as usual, but each property is only unmarshalled
+            (into a model, a dictionary or, for nested objects, another LazyModel) when it is first accessed. This
+            saves building models for the parts of large payloads a handler doesn't look at.
+        :type lazy_unmarshalling: bool
         :param user_defined_formats: A list of any custom formats (as defined by Bravado-Core) for our Swagger Spec.
         :type user_defined_formats: bool
         :param include_missing_properties: Should we include any missing properties as None?
@@ -250,9 +1855,47 @@ class SwaggerPlugin(object):
         :param ignore_security_definitions: Should we ignore the set security definitions? This might make sense if
                                             you also want to permit Cookie auth (which is not available in OpenAPI 2).
         :type ignore_security_definitions: bool
+        :param security_verifiers: Functions verifying credentials, keyed by security definition name. Each takes the
+            credential found in the request (the key of an ``apiKey`` definition, the (user, password) tuple of a
+            ``basic`` one or the bearer token of an ``oauth2`` one) and returns the principal it belongs to (any
+            object), or None (or False) to reject it. The principal of the requirement that was met is attached to
+            the request as ``swagger_principal``; requests meeting none of them trigger the
+            ``invalid_security_handler``. Not used if ``ignore_security_definitions`` is set.
+        :type security_verifiers: dict
+        :param security_cache_size: If not 0, the number of verified credentials (and their principals) kept in a
+            least recently used cache, so the verifiers aren't called again on every request with the same
+            credentials. Rejected credentials are not cached.
+        :type security_cache_size: int
+        :param security_cache_ttl: The number of seconds after which a cached credential is verified again.
+        :type security_cache_ttl: float
         :param auto_jsonify: Should we automatically convert data returned from our callbacks to JSON? Bottle
-            normally will attempt to convert only objects, but we can do better.
+            normally will attempt to convert only objects, but we can do better. If the response is specified as
+            a JSON array, a generator (or other iterator) may be returned instead of a list; its items are then
+            validated against the ``items`` schema and encoded one at a time, as the body is written out.
         :type auto_jsonify: bool
+        :param json_encoder: If not None, the callable used to encode response bodies, error payloads and the served
+            Swagger schema to JSON, in place of Bottle's ``json_dumps``. It may return bytes (preferably, e.g. orjson)
+            or a string (e.g. ujson).
+        :type json_encoder: object -> bytes | str
+        :param json_decoder: If not None, the callable used to decode JSON request bodies (passed as bytes), in place
+            of Bottle's own ``request.json`` parsing.
+        :type json_decoder: bytes -> object
+        :param async_callbacks: If True, a coroutine returned by a route callback (i.e. an ``async def`` one) is run to
+            completion on a new asyncio event loop, in the worker thread, and its result handled as the callback's.
+            The worker is still tied up until the coroutine is done, so this is about using async code (and
+            libraries) in route callbacks, not about concurrency. Fails (with a 500) if an event loop is already
+            running in the worker thread.
+        :type async_callbacks: bool
+        :param validation_executor: If not None, the ``concurrent.futures.Executor`` (or anything with a compatible
+            ``submit`` method) request bodies and responses of at least ``offload_threshold_bytes`` are validated on.
+            Under gevent, a pool of real threads (e.g. ``gevent.threadpool.ThreadPoolExecutor``) lets the other
+            greenlets run while a large payload is validated. The request body is still read by the worker, and the
+            credentials still verified there. Process pools won't do: the validators can't be pickled.
+        :type validation_executor: concurrent.futures.Executor | NoneType
+        :param offload_threshold_bytes: The size (the Content-Length of a request, or the encoded JSON body of a
+            response) from which validation is handed to the ``validation_executor``. Chunked request bodies are
+            always handed over. Smaller payloads are validated inline, where it's cheaper than the hand-off.
+        :type offload_threshold_bytes: int
         :param invalid_request_handler: This handler is triggered when the request validation fails.
         :type invalid_request_handler: BaseException -> HTTP Response
         :param invalid_response_handler: This handler is triggered when the response validation fails.
@@ -260,6 +1903,12 @@ class SwaggerPlugin(object):
         :param invalid_security_handler: This handler is triggered when no means of authentication
                                          were found for the request.
         :type invalid_security_handler: BaseException -> HTTP Response
+        :param request_too_large_handler: This handler is triggered when the request body is larger than its
+                                          operation allows.
+        :type request_too_large_handler: RequestBodyTooLarge -> HTTP Response
+        :param unsupported_media_type_handler: This handler is triggered when the request body has a content type
+                                               its operation doesn't consume.
+        :type unsupported_media_type_handler: UnsupportedMediaType -> HTTP Response
         :param swagger_op_not_found_handler: This handler is triggered if the route isn't found for the API subpath,
            and ignore_missing_routes has been set True.
         :type swagger_op_not_found_handler: bottle.Route -> HTTP Response
@@ -274,6 +1923,9 @@ class SwaggerPlugin(object):
         :type serve_swagger_schema: bool
         :param swagger_schema_suburl: The subpath in the API to serve the swagger schema.
         :type swagger_schema_suburl: str
+        :param swagger_schema_cache_control: The Cache-Control header sent with the swagger schema. The schema is
+            always served with an ETag, so the default of "no-cache" lets clients cheaply revalidate their copy.
+        :type swagger_schema_cache_control: str
         :param serve_swagger_ui: Should we also serve a copy of Swagger UI?
         :type serve_swagger_ui: bool
         :param swagger_ui_schema_url: If this is not None, this will be used to set the default URL used with the
@@ -286,22 +1938,65 @@ class SwaggerPlugin(object):
         :param swagger_ui_validator_url: The URL for a Swagger validator instance. If None, validation in the UI is off.
             If this is set to an arity 0 callable, this will be evaluated each time the Swagger UI is constructed.
         :type swagger_ui_validator_url: str | -> str | NoneType
+        :param swagger_ui_assets_cache_control: The Cache-Control header sent with the bundled Swagger UI files
+            requested with the Swagger UI version in the query string, as the UI index references them; by default
+            they are cached for a year and marked immutable. Requests without it (e.g. for the source maps or
+            ``oauth2-redirect.html``) get "no-cache", so they are revalidated through their ETag.
+        :type swagger_ui_assets_cache_control: str
         :param extra_bravado_config: Any additional Bravado configuration items you may want.
         :type extra_bravado_config: object
+        :param spec_cache_dir: If not None, a directory where the built (validated and, if enabled, dereferenced)
+            Bravado spec is cached, keyed by a hash of the Swagger spec and the Bravado configuration. Processes
+            finding a matching cache entry skip validating and dereferencing the spec entirely. Only the
+            ``SPEC_CACHE_MAX_ENTRIES`` most recently used entries are kept. The cache holds pickles, so only point
+            this at a directory that only trusted users can write to.
+        :type spec_cache_dir: str | NoneType
+        :param metrics: If not None, an object whose ``observe(operation_id, phase, seconds)`` method is called with
+            the duration of the request validation, handler, response validation and serialization phases (and
+            the total) of every request, and whose ``increment(operation_id, counter)`` method is called for
+            every invalid request, security failure, invalid response, not found route (with an operation id of
+            None) and exception. ``SwaggerMetrics`` aggregates them in-process.
+        :type metrics: SwaggerMetrics | NoneType
         """
         plugin_logger.debug("Initializing Bottle Swagger Plugin...")
+        if validation_engine not in VALIDATION_ENGINES:
+            raise ValueError("Unknown validation engine {!r}, expected one of {!r}".format(
+                validation_engine, VALIDATION_ENGINES
+            ))
         swagger_def = dict(swagger_def)
         if swagger_base_path is not None:
             swagger_def.update(basePath=swagger_base_path)
 
         self.ignore_undefined_routes = ignore_undefined_api_routes
+        self.response_validation_sample_rate = response_validation_sample_rate
+        self.response_validation_sample_rates = response_validation_sample_rates or {}
+        self.response_validation_time_budget = response_validation_time_budget
+        self.enforce_response_validation = enforce_response_validation
+        self.validation_engine = validation_engine
+        self.streamed_request_bodies = frozenset(streamed_request_bodies or ())
+        self.lazy_unmarshalling = lazy_unmarshalling
+        self.max_request_body_bytes = max_request_body_bytes
+        self.validate_request_content_type = validate_request_content_type
+        self.stream_multipart_uploads = stream_multipart_uploads
         self.ignore_security_definitions = ignore_security_definitions
+        self.security_verifiers = security_verifiers or {}
+        self.credential_cache = None
+        if security_cache_size:
+            self.credential_cache = CredentialCache(security_cache_size, security_cache_ttl)
         self.auto_jsonify = auto_jsonify
+        self.json_encoder = json_encoder
+        self.json_decoder = json_decoder
+        self.async_callbacks = async_callbacks
+        self.validation_executor = validation_executor
+        self.offload_threshold_bytes = offload_threshold_bytes
         self.invalid_request_handler = invalid_request_handler
         self.invalid_response_handler = invalid_response_handler
         self.invalid_security_handler = invalid_security_handler
+        self.request_too_large_handler = request_too_large_handler
+        self.unsupported_media_type_handler = unsupported_media_type_handler
         self.swagger_op_not_found_handler = swagger_op_not_found_handler
         self.exception_handler = exception_handler
+        self.metrics = metrics
         self.serve_swagger_ui = serve_swagger_ui
         self.swagger_ui_schema_url = swagger_ui_schema_url
 
@@ -315,8 +2010,10 @@ class SwaggerPlugin(object):
             )
 
         self.swagger_ui_validator_url = swagger_ui_validator_url
+        self.swagger_ui_assets_cache_control = swagger_ui_assets_cache_control
 
         self.swagger_schema_suburl = swagger_schema_suburl
+        self.swagger_schema_cache_control = swagger_schema_cache_control
         self.swagger_ui_suburl = swagger_ui_suburl
         self.bravado_config = extra_bravado_config or {}
         self.bravado_config.update({
@@ -330,198 +2027,883 @@ class SwaggerPlugin(object):
             'internally_dereference_refs': internally_dereference_refs
         })
 
-        self.swagger = Spec.from_dict(swagger_def, config=self.bravado_config)
+        self.swagger = build_swagger_spec(swagger_def, self.bravado_config, spec_cache_dir=spec_cache_dir)
         self.swagger_base_path = swagger_base_path or urlparse(self.swagger.api_url).path or '/'
         self.adjust_api_base_path = adjust_api_base_path
 
         fixed_base_path = (self.swagger_base_path.rstrip("/")) + "/"
         self.swagger_schema_url = urljoin(fixed_base_path, self.swagger_schema_suburl.lstrip("/"))
         self.swagger_ui_base_url = urljoin(fixed_base_path, self.swagger_ui_suburl.lstrip("/"))
+
+        # (HTTP method, bottle rule) -> bravado Operation (or None), filled in as routes are applied.
+        self._swagger_op_table = {}
+        # bravado Operation -> SwaggerOperationPlan
+        self._operation_plans = {}
+        # Start and spent validation time of the current response validation time budget window.
+        self._response_validation_window = [0.0, 0.0]
+        # Served basePath -> (serialized schema, ETag). Plain dict assignments are atomic, so concurrent misses
+        # merely serialize the same schema twice.
+        self._swagger_schema_cache = {}
+        # (schema URL, validator URL) -> (rendered Swagger UI index, ETag)
+        self._swagger_ui_index_cache = {}
         plugin_logger.debug("Bottle Swagger Plugin Initialization Completed!")
 
     def apply(self, callback, route):
+        if route.method == 'ANY':
+            return self._apply_any_method(callback, route)
+
+        swagger_op = self._resolve_swagger_op(route.method, route.rule)
+        route_kind = self._classify_route(route, swagger_op)
+
+        if route_kind == ROUTE_KIND_OPERATION:
+            plan = self._operation_plan(swagger_op)
+
+            def wrapper(*args, **kwargs):
+                return self._swagger_validate(plan, callback, *args, **kwargs)
+        elif route_kind == ROUTE_KIND_NOT_FOUND:
+            def wrapper(*args, **kwargs):
+                return self._swagger_op_not_found(route)
+        else:
+            # Routes outside of the API (and our own schema/UI routes) don't need the plugin at all.
+            return callback
+
+        return wrapper
+
+    def _apply_any_method(self, callback, route):
+        # The operation depends on the method of each request, but is still only resolved once per method.
+        undefined_route_kind = self._classify_route(route, None)
+
         def wrapper(*args, **kwargs):
-            return self._swagger_validate(callback, route, *args, **kwargs)
+            swagger_op = self._resolve_swagger_op(request.method, route.rule)
+            if swagger_op:
+                return self._swagger_validate(self._operation_plan(swagger_op), callback, *args, **kwargs)
+            elif undefined_route_kind == ROUTE_KIND_NOT_FOUND:
+                return self._swagger_op_not_found(route)
+            else:
+                return callback(*args, **kwargs)
 
         return wrapper
 
+    def _classify_route(self, route, swagger_op):
+        if swagger_op:
+            return ROUTE_KIND_OPERATION
+        elif self._is_swagger_schema_route(route):
+            return ROUTE_KIND_SCHEMA
+        elif self._is_swagger_ui_route(route):
+            return ROUTE_KIND_UI
+        elif not route.rule.startswith(self.swagger_base_path) or self.ignore_undefined_routes:
+            return ROUTE_KIND_PASSTHROUGH
+        else:
+            return ROUTE_KIND_NOT_FOUND
+
+    def prepare(self, app=None, freeze_gc=False):
+        """
+        Eagerly do all the work the plugin otherwise does lazily on the first requests: building the plans (with
+        their compiled validators) for every Swagger operation (and everything Bravado Core computes lazily for
+        them), serializing the Swagger schema and compressing the Swagger UI files, and, if an application is
+        given, applying the plugin to all of its routes.
+
+        Call this in the master process of a pre-forking server (e.g. in a gunicorn ``on_starting`` hook, or at
+        import time with ``--preload``) so that the workers share the result copy-on-write instead of each of them
+        warming up on their first requests.
+
+            >>> my_plugin = SwaggerPlugin(my_swagger_def)
+            >>> my_app.install(my_plugin)
+            >>> my_plugin.prepare(my_app, freeze_gc=True)
+
+        :param app: A Bottle application to prepare the routes of, if any.
+        :type app: bottle.Bottle | NoneType
+        :param freeze_gc: Should everything allocated so far be moved into the permanent GC generation (with
+            ``gc.freeze``, Python 3.7+), so that garbage collections in the workers don't touch (and thus copy)
+            those pages?
+        :type freeze_gc: bool
+        :return: This plugin.
+        :rtype: SwaggerPlugin
+        """
+        plugin_logger.debug("Preparing Bottle Swagger Plugin...")
+        for resource in self.swagger.resources.values():
+            for swagger_op in resource.operations.values():
+                self._operation_plan(swagger_op)
+        # Forces Bravado to build its (method, path) -> operation map.
+        self.swagger.get_op_for_request('get', self.swagger_base_path)
+
+        if self.serve_swagger_schema:
+            self._serialized_swagger_schema(script_name='')
+        if self.serve_swagger_ui:
+            for name in SWAGGER_UI_ASSET_NAMES:
+                load_swagger_ui_asset(name)
+
+        if app is not None:
+            for route in app.routes:
+                route.prepare()
+
+        if freeze_gc and hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+        plugin_logger.debug("Bottle Swagger Plugin Prepared!")
+        return self
+
     def setup(self, app):
         if self.serve_swagger_schema:
             @app.get(self.swagger_schema_url)
             def swagger_schema():
-                spec_dict = self.swagger.spec_dict
-                if self.adjust_api_base_path and "basePath" in spec_dict:
-                    spec_dict["basePath"] = urljoin(
-                        urljoin("/", request.environ.get('SCRIPT_NAME', '').strip('/') + '/'),
-                        self.swagger_base_path.lstrip("/")
-                    )
-                return spec_dict
+                body, etag = self._serialized_swagger_schema()
+                return _cacheable_response(body, etag, 'application/json', self.swagger_schema_cache_control)
 
         if self.serve_swagger_ui:
             @app.get(self.swagger_ui_base_url)
             def swagger_ui_index():
-                if self.swagger_ui_schema_url is not None and callable(self.swagger_ui_schema_url):
-                    schema_url = self.swagger_ui_schema_url()
-                elif self.swagger_ui_schema_url is not None:
-                    schema_url = self.swagger_ui_schema_url
-                elif self.serve_swagger_schema:
-                    schema_url = app.get_url(self.swagger_schema_url)
-                else:
-                    schema_url = ""
-                if self.swagger_ui_validator_url is not None and callable(self.swagger_ui_validator_url):
-                    validator_url = self.swagger_ui_validator_url()
-                else:
-                    validator_url = self.swagger_ui_validator_url
-                return render_index_html(
-                    schema_url,
-                    validator_url=validator_url
-                )
+                body, etag = self._rendered_swagger_ui_index(app)
+                # The schema and validator URLs may be computed per request, so always revalidate.
+                return _cacheable_response(body, etag, 'text/html; charset=UTF-8', 'no-cache')
 
             @app.get(urljoin(self.swagger_ui_base_url, "<path:path>"))
             def swagger_ui_assets(path):
-                return static_file(path, SWAGGER_UI_DIR)
-
-    def _swagger_validate(self, callback, route, *args, **kwargs):
-        swagger_op = self._swagger_op(route)
-
-        if not swagger_op:
+                asset = load_swagger_ui_asset(path)
+                if asset is None:
+                    return HTTPError(404, "File does not exist.")
+                encoding, body, etag = asset.negotiate(request.headers.get('Accept-Encoding'))
+                response.set_header('Vary', 'Accept-Encoding')
+                if encoding is not None:
+                    response.set_header('Content-Encoding', encoding)
+                # Only URLs carrying the Swagger UI version (as the index links them) are sure to never change;
+                # anything else (source maps, oauth2-redirect.html, ...) is revalidated through its ETag.
+                if request.query.get('v') == SWAGGER_UI_VERSION:
+                    cache_control = self.swagger_ui_assets_cache_control
+                else:
+                    cache_control = 'no-cache'
+                return _cacheable_response(body, etag, asset.content_type, cache_control)
+
+    def _serialized_swagger_schema(self, script_name=None):
+        if script_name is None:
+            script_name = request.environ.get('SCRIPT_NAME', '')
+        spec_dict = self.swagger.spec_dict
+        base_path = spec_dict.get("basePath")
+        if self.adjust_api_base_path and base_path is not None:
+            base_path = urljoin(
+                urljoin("/", script_name.strip('/') + '/'),
+                self.swagger_base_path.lstrip("/")
+            )
 
-            if not route.rule.startswith(self.swagger_base_path) or self.ignore_undefined_routes:
-                return callback(*args, **kwargs)
-            elif self.serve_swagger_schema  and route.rule == self.swagger_schema_url:
-                return callback(*args, **kwargs)
-            elif self.serve_swagger_ui and route.rule.startswith(self.swagger_ui_base_url):
-                return callback(*args, **kwargs)
-            else:
-                return self.swagger_op_not_found_handler(route)
+        try:
+            return self._swagger_schema_cache[base_path]
+        except KeyError:
+            pass
+
+        if base_path is not None:
+            spec_dict = dict(spec_dict, basePath=base_path)
+        body = _to_json_bytes(spec_dict, self.json_encoder)
+        if len(self._swagger_schema_cache) >= self.MAX_CACHED_SCHEMA_VARIANTS:
+            self._swagger_schema_cache.clear()
+        cached = self._swagger_schema_cache[base_path] = (body, _make_etag(body))
+        return cached
+
+    def _rendered_swagger_ui_index(self, app):
+        if self.swagger_ui_schema_url is not None and callable(self.swagger_ui_schema_url):
+            schema_url = self.swagger_ui_schema_url()
+        elif self.swagger_ui_schema_url is not None:
+            schema_url = self.swagger_ui_schema_url
+        elif self.serve_swagger_schema:
+            schema_url = app.get_url(self.swagger_schema_url)
+        else:
+            schema_url = ""
+        if self.swagger_ui_validator_url is not None and callable(self.swagger_ui_validator_url):
+            validator_url = self.swagger_ui_validator_url()
+        else:
+            validator_url = self.swagger_ui_validator_url
 
+        key = (schema_url, validator_url)
+        try:
+            return self._swagger_ui_index_cache[key]
+        except KeyError:
+            pass
+
+        body = render_index_html(schema_url, validator_url=validator_url).encode('utf-8')
+        if len(self._swagger_ui_index_cache) >= self.MAX_CACHED_UI_INDEX_VARIANTS:
+            self._swagger_ui_index_cache.clear()
+        cached = self._swagger_ui_index_cache[key] = (body, _make_etag(body))
+        return cached
+
+    def _swagger_op_not_found(self, route):
+        if self.metrics is not None:
+            self.metrics.increment(None, COUNTER_NOT_FOUND)
+        return self._jsonify_handler_result(self.swagger_op_not_found_handler(route))
+
+    def _swagger_validate(self, plan, callback, *args, **kwargs):
+        swagger_op = plan.swagger_op
+        metrics = self.metrics
+        started = _timer()
         try:
             request.swagger_op = swagger_op
 
             try:
-                request.swagger_data = self._validate_request(
-                    swagger_op, ignore_security_definitions=self.ignore_security_definitions
+                if plan.check_body:
+                    plan.check_request_body(request)
+                if self._offloads_request(plan):
+                    # The body is read from the server here; the executor only parses and validates it, through a
+                    # request bound to the same environ (Bottle's ``request`` is thread-local).
+                    request.body
+                    request.swagger_data = self._offload(self._validate_request, plan, BaseRequest(request.environ))
+                else:
+                    request.swagger_data = self._validate_request(plan, request)
+                request.swagger_principal = plan.verify_credentials(
+                    request, request.swagger_data, self.credential_cache
                 )
+            except (UploadTooLarge, MalformedRequestBody) as e:
+                self._count(plan, COUNTER_INVALID_REQUEST)
+                return self._jsonify_handler_result(self.invalid_request_handler(e))
+            except RequestBodyTooLarge as e:
+                self._count(plan, COUNTER_INVALID_REQUEST)
+                return self._jsonify_handler_result(self.request_too_large_handler(e))
+            except UnsupportedMediaType as e:
+                self._count(plan, COUNTER_INVALID_REQUEST)
+                return self._jsonify_handler_result(self.unsupported_media_type_handler(e))
             except SwaggerSecurityValidationError as e:
-                return self.invalid_security_handler(e)
+                self._count(plan, COUNTER_INVALID_SECURITY)
+                return self._jsonify_handler_result(self.invalid_security_handler(e))
             except ValidationError as e:
-                return self.invalid_request_handler(e)
-
-            result = callback(*args, **kwargs)
-            result_payload = result.body if isinstance(result, HTTPResponse) else result
+                self._count(plan, COUNTER_INVALID_REQUEST)
+                return self._jsonify_handler_result(self.invalid_request_handler(e))
 
+            request_validated = _timer()
             try:
-                self._validate_response(swagger_op, result_payload)
-            except (ValidationError, MatchingResponseNotFound) as e:
-                return self.invalid_response_handler(e)
-
-            if self.auto_jsonify and isinstance(result, (dict, list)):
-                result = json_dumps(result)
+                result = callback(*args, **kwargs)
+                if self.async_callbacks and _is_coroutine(result):
+                    result = run_coroutine(result)
+            except StreamedBodyValidationError as e:
+                self._count(plan, COUNTER_INVALID_REQUEST)
+                return self._jsonify_handler_result(self.invalid_request_handler(e))
+            handled = _timer()
+            result_payload = result.body if isinstance(result, HTTPResponse) else result
+            if self.auto_jsonify and _is_item_stream(result_payload):
+                streamed = self._stream_response(plan, result, result_payload)
+                if streamed is not None:
+                    if metrics is not None:
+                        # The body is only produced once Bottle iterates over it, after we return.
+                        metrics.observe(plan.operation_id, PHASE_REQUEST_VALIDATION, request_validated - started)
+                        metrics.observe(plan.operation_id, PHASE_HANDLER, handled - request_validated)
+                    return streamed
+            # The payload is serialized at most once, and shared by response validation and the final body.
+            outgoing_response = BottleOutgoingResponse(response, result_payload, json_encoder=self.json_encoder)
+
+            response_validated = None
+            if self._should_validate_response(plan):
+                try:
+                    self._timed_validate_response(plan, outgoing_response)
+                except (ValidationError, MatchingResponseNotFound) as e:
+                    self._count(plan, COUNTER_INVALID_RESPONSE)
+                    if self.enforce_response_validation:
+                        return self._jsonify_handler_result(self.invalid_response_handler(e))
+                    plugin_logger.warning("Invalid response for operation %s: %s", plan.operation_id, e)
+                response_validated = _timer()
+
+            if self.auto_jsonify and isinstance(result_payload, (dict, list)):
+                if isinstance(result, HTTPResponse):
+                    result.body = outgoing_response.raw_bytes
+                    result.content_type = 'application/json'
+                else:
+                    result = outgoing_response.raw_bytes
                 response.content_type = 'application/json'
             elif self.auto_jsonify and isinstance(result, HTTPResponse):
-                result.body = json_dumps(result_payload)
+                # Any other payload is JSON encoded too (e.g. a string, sent quoted), just as dicts and lists.
+                result.body = _to_json_bytes(result_payload, self.json_encoder)
                 response.content_type = result.content_type = 'application/json'
+
+            if metrics is not None:
+                finished = _timer()
+                operation_id = plan.operation_id
+                metrics.observe(operation_id, PHASE_REQUEST_VALIDATION, request_validated - started)
+                metrics.observe(operation_id, PHASE_HANDLER, handled - request_validated)
+                if response_validated is not None:
+                    metrics.observe(operation_id, PHASE_RESPONSE_VALIDATION, response_validated - handled)
+                metrics.observe(operation_id, PHASE_SERIALIZATION, finished - (response_validated or handled))
+                metrics.observe(operation_id, PHASE_TOTAL, finished - started)
         except Exception as e:
             # Bottle handles redirects by raising an HTTPResponse instance
             if isinstance(e, HTTPResponse):
                 raise e
 
-            return self.exception_handler(e)
+            self._count(plan, COUNTER_EXCEPTION)
+            return self._jsonify_handler_result(self.exception_handler(e))
 
         return result
 
-    @staticmethod
-    def _validate_request(swagger_op, ignore_security_definitions=False):
-        if ignore_security_definitions:
-            swagger_op = SecurityPatchedOperation(swagger_op)
-        return unmarshal_request(BottleIncomingRequest(request), swagger_op)
+    def _stream_response(self, plan, result, items):
+        """
+        Send the iterator returned by a route callback as a JSON array, encoded (and validated
+        against the ``items`` schema) one item at a time as the body is written out.
 
-    @staticmethod
-    def _validate_response(swagger_op, result):
-        response_spec = get_response_spec(int(response.status_code), swagger_op)
-        outgoing_response = BottleOutgoingResponse(response, result)
-        validate_response(response_spec, swagger_op, outgoing_response)
+        :return: The result to hand back to Bottle, or None if the matching response isn't a JSON array.
+        """
+        response_plan = plan.responses.get(str(response.status_code), plan.default_response)
+        if response_plan is None or response_plan.items_spec is None or APP_JSON not in response_plan.produces:
+            return None
 
-    def _swagger_op(self, route):
-        # Convert bottle "<param>" style path params to swagger "{param}" style
-        path = re.sub(r'/<(.+?)(:.+)?>', r'/{\1}', route.rule)
-        return self.swagger.get_op_for_request(request.method, path)
+        items_validator = None
+        if self._should_validate_response(plan):
+            try:
+                response_plan.validate_headers(BottleOutgoingResponse(response, None))
+            except ValidationError as e:
+                self._count(plan, COUNTER_INVALID_RESPONSE)
+                if self.enforce_response_validation:
+                    _close_iterator(items)
+                    return self._jsonify_handler_result(self.invalid_response_handler(e))
+                plugin_logger.warning("Invalid response for operation %s: %s", plan.operation_id, e)
+            items_validator = response_plan.items_validator
+
+        body = self._json_array_stream(plan, items, items_validator)
+        response.content_type = 'application/json'
+        if isinstance(result, HTTPResponse):
+            result.body = body
+            result.content_type = 'application/json'
+            return result
+        return body
+
+    def _json_array_stream(self, plan, items, items_validator):
+        chunk, chunk_size = [b'['], 1
+        try:
+            for index, item in enumerate(items):
+                if items_validator is not None:
+                    try:
+                        items_validator(item)
+                    except ValidationError as e:
+                        e.path.appendleft(index)
+                        self._count(plan, COUNTER_INVALID_RESPONSE)
+                        if self.enforce_response_validation:
+                            # The status line and part of the body may already be out, so all that is left
+                            # is to break the response off (as an unterminated array), rather than to end it
+                            # as if it were complete.
+                            plugin_logger.error(
+                                "Invalid item in streamed response for operation %s: %s", plan.operation_id, e
+                            )
+                            if chunk_size:
+                                yield b''.join(chunk)
+                            return
+                        plugin_logger.warning(
+                            "Invalid item in streamed response for operation %s: %s", plan.operation_id, e
+                        )
+                encoded = _to_json_bytes(item, self.json_encoder)
+                if index:
+                    chunk.append(b',')
+                chunk.append(encoded)
+                chunk_size += len(encoded) + 1
+                if chunk_size >= self.STREAM_CHUNK_SIZE:
+                    yield b''.join(chunk)
+                    chunk, chunk_size = [], 0
+            chunk.append(b']')
+            yield b''.join(chunk)
+        finally:
+            _close_iterator(items)
+
+    def _count(self, plan, counter):
+        if self.metrics is not None:
+            self.metrics.increment(plan.operation_id, counter)
+
+    def _jsonify_handler_result(self, result):
+        if self.auto_jsonify and isinstance(result, (dict, list)):
+            response.content_type = 'application/json'
+            return _to_json_bytes(result, self.json_encoder)
+        return result
+
+    def _should_validate_response(self, plan):
+        sample_rate = plan.response_sample_rate
+        if sample_rate <= 0.0 or (sample_rate < 1.0 and random.random() >= sample_rate):
+            return False
+        elif self.response_validation_time_budget is None:
+            return True
+
+        window = self._response_validation_window
+        now = _timer()
+        if now - window[0] >= 1.0:
+            window[0], window[1] = now, 0.0
+        return window[1] < self.response_validation_time_budget
+
+    def _timed_validate_response(self, plan, outgoing_response):
+        if self.response_validation_time_budget is None:
+            return self._validate_response(plan, outgoing_response)
+
+        started = _timer()
+        try:
+            self._validate_response(plan, outgoing_response)
+        finally:
+            # Racing threads may lose an update here, which is fine for a budget that is approximate anyway.
+            self._response_validation_window[1] += _timer() - started
+
+    def _operation_plan(self, swagger_op):
+        try:
+            return self._operation_plans[swagger_op]
+        except KeyError:
+            plan = self._operation_plans[swagger_op] = self._build_operation_plan(swagger_op)
+            return plan
+
+    def _build_operation_plan(self, swagger_op):
+        # Bravado computes (and caches) these lazily; touch them now rather than on the first request.
+        for lazy_attribute in ('consumes', 'produces', 'security_requirements', 'security_parameters'):
+            getattr(swagger_op, lazy_attribute)
+        return SwaggerOperationPlan(
+            swagger_op,
+            response_sample_rate=self._response_sample_rate(swagger_op),
+            validate_security=not self.ignore_security_definitions,
+            validation_engine=self.validation_engine,
+            stream_body=self._streams_body(swagger_op),
+            max_body_bytes=self.max_request_body_bytes,
+            check_content_type=self.validate_request_content_type,
+            security_verifiers=self.security_verifiers,
+            lazy_unmarshalling=self.lazy_unmarshalling,
+            stream_uploads=self.stream_multipart_uploads
+        )
+
+    def _response_sample_rate(self, swagger_op):
+        if not self.bravado_config['validate_responses']:
+            return 0.0
+
+        sample_rates = self.response_validation_sample_rates
+        op_spec = swagger_op.op_spec
+        for key in [swagger_op.operation_id, op_spec.get('operationId')] + op_spec.get('tags', []):
+            if key in sample_rates:
+                return sample_rates[key]
+        return self.response_validation_sample_rate
+
+    def _streams_body(self, swagger_op):
+        op_spec = swagger_op.op_spec
+        keys = [swagger_op.operation_id, op_spec.get('operationId')] + op_spec.get('tags', [])
+        return any(key in self.streamed_request_bodies for key in keys)
+
+    def _validate_request(self, plan, bottle_request):
+        if plan.stream_uploads:
+            plan.read_multipart(bottle_request)
+        return plan.unmarshal_request(
+            BottleIncomingRequest(bottle_request, json_decoder=self.json_decoder, locations=plan.locations)
+        )
+
+    def _validate_response(self, plan, outgoing_response):
+        status_code = int(response.status_code)
+        if self._offloads_response(outgoing_response):
+            # Look up what is needed from Bottle's (thread-local) response before handing it over.
+            outgoing_response.content_type
+            outgoing_response.headers
+            return self._offload(plan.validate_response, status_code, outgoing_response)
+        plan.validate_response(status_code, outgoing_response)
+
+    def _offloads_request(self, plan):
+        if self.validation_executor is None or not plan.parses_body:
+            return False
+        return request.chunked or request.content_length >= self.offload_threshold_bytes
+
+    def _offloads_response(self, outgoing_response):
+        return self.validation_executor is not None and isinstance(outgoing_response.response_json, (dict, list)) \
+            and len(outgoing_response.raw_bytes) >= self.offload_threshold_bytes
+
+    def _offload(self, function, *args):
+        # Exceptions raised by the function are raised again here.
+        return self.validation_executor.submit(function, *args).result()
+
+    def _resolve_swagger_op(self, method, rule):
+        key = (method.upper(), rule)
+        try:
+            return self._swagger_op_table[key]
+        except KeyError:
+            # Convert bottle "<param>" style path params to swagger "{param}" style
+            path = BOTTLE_PATH_PARAM_PATTERN.sub(r'/{\1}', rule)
+            swagger_op = self._swagger_op_table[key] = self.swagger.get_op_for_request(method, path)
+            return swagger_op
 
     def _is_swagger_schema_route(self, route):
-        return self.serve_swagger_schema and route.rule == self.swagger_schema_suburl
+        return self.serve_swagger_schema and route.rule == self.swagger_schema_url
+
+    def _is_swagger_ui_route(self, route):
+        return self.serve_swagger_ui and route.rule.startswith(self.swagger_ui_base_url)
 
 
 class BottleIncomingRequest(IncomingRequest):
     """
-    The Incoming Request wrapper fed into Bravado Core for validation.
+    The Incoming Request wrapper the parameters are unmarshalled from.
+
+    Each part of the request is looked up on the Bottle request at most once, and only when
+    it is first needed. If the parameter locations of the operation are given, the parts of
+    the request no parameter is read from are empty, rather than parsed (or read) for nothing.
 
     Users should not need to consume this directly.
     """
-    def __init__(self, bottle_request):
+    # The attributes set on every instance are slots; the base class still gives instances a __dict__.
+    __slots__ = ('request', 'json_decoder', 'locations', '_path', '_query', '_headers', '_form', '_files')
+
+    JSON_CONTENT_TYPES = ('application/json', 'application/json-rpc')
+
+    def __init__(self, bottle_request, json_decoder=None, locations=None):
         self.request = bottle_request
-        self.path = bottle_request.url_args
+        self.json_decoder = json_decoder
+        self.locations = locations
+        self._path = None
+        self._query = None
+        self._headers = None
+        self._form = None
+        self._files = None
 
     def json(self):
-        return self.request.json
+        if not self._declares('body'):
+            return None
+        elif self.json_decoder is None:
+            return self.request.json
+
+        # Mirrors bottle.BaseRequest.json, but hands the raw bytes straight to the configured decoder.
+        content_type = self.request.environ.get('CONTENT_TYPE', '').lower().split(';')[0]
+        if content_type not in self.JSON_CONTENT_TYPES:
+            return None
+        body = self.request.body.read(self.request.MEMFILE_MAX + 1)
+        if len(body) > self.request.MEMFILE_MAX:
+            raise HTTPError(413, 'Request entity too large')
+        elif not body:
+            return None
+        try:
+            return self.json_decoder(body)
+        except (ValueError, TypeError):
+            raise HTTPError(400, 'Invalid JSON')
+
+    def json_array_reader(self):
+        """
+        :return: A reader for the JSON body of the request, or None if it has none.
+        :rtype: JSONArrayReader | NoneType
+        """
+        if not self._declares('body'):
+            return None
+        content_type = self.request.environ.get('CONTENT_TYPE', '').lower().split(';')[0]
+        if content_type not in self.JSON_CONTENT_TYPES:
+            return None
+        reader = JSONArrayReader(self.request.body)
+        return None if reader.is_empty else reader
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = self.request.url_args if self._declares('path') else {}
+        return self._path
 
     @property
     def query(self):
-        return self.request.query
+        if self._query is None:
+            self._query = self.request.query if self._declares('query') else FormsDict()
+        return self._query
 
     @property
     def headers(self):
-        return self.request.headers
+        if self._headers is None:
+            self._headers = self.request.headers if self._declares('header') else {}
+        return self._headers
 
     @property
     def form(self):
-        return self.request.forms
+        if self._form is None:
+            self._form = self.request.forms if self._declares('formData') else FormsDict()
+        return self._form
 
     @property
     def files(self):
-        return self.request.files
+        if self._files is None:
+            self._files = self.request.files if self._declares('formData') else FormsDict()
+        return self._files
+
+    def _declares(self, location):
+        return self.locations is None or location in self.locations
+
+
+class JSONArrayReader(object):
+    """
+    Iterates over the items of a JSON array read from a file-like object, holding only a chunk of
+    the input and the item being decoded in memory. Malformed JSON raises a "400 Bad Request".
+
+    Users should not need to consume this directly.
+    """
+    CHUNK_SIZE = 64 * 1024
+    WHITESPACE = re.compile(r'[ \t\n\r]*')
+    decoder = json.JSONDecoder()
+
+    def __init__(self, body):
+        self.body = body
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.position = 0
+        self.at_eof = False
+        self.count = 0
+        self.finished = False
+        first = self._peek()
+        self.is_empty = first == u''
+        self.is_array = first == u'['
+        if self.is_array:
+            self.position += 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.finished:
+            raise StopIteration
+        char = self._peek()
+        if char == u']':
+            self.position += 1
+            self.finished = True
+            if self._peek() != u'':
+                raise HTTPError(400, 'Invalid JSON')
+            raise StopIteration
+        elif self.count:
+            if char != u',':
+                raise HTTPError(400, 'Invalid JSON')
+            self.position += 1
+            self._peek()
+        self.count += 1
+        return self._decode()
+
+    next = __next__
+
+    def remainder(self):
+        """
+        :return: The (whole) JSON value following what was read so far.
+        """
+        while self._read():
+            pass
+        try:
+            return json.loads(self.buffer[self.position:])
+        except ValueError:
+            raise HTTPError(400, 'Invalid JSON')
+
+    def _read(self):
+        if self.at_eof:
+            return False
+        data = self.body.read(self.CHUNK_SIZE)
+        try:
+            text = self.text_decoder.decode(data, final=not data)
+        except UnicodeDecodeError:
+            raise HTTPError(400, 'Invalid JSON')
+        self.at_eof = not data
+        self.buffer = self.buffer[self.position:] + text
+        self.position = 0
+        return True
+
+    def _peek(self):
+        # The next non-whitespace character (not consumed), or an empty string at the end of the input.
+        while True:
+            self.position = self.WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            elif not self._read():
+                return u''
+
+    def _decode(self):
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                # Most likely an item cut in two by the end of the chunk.
+                if not self._read():
+                    raise HTTPError(400, 'Invalid JSON')
+                continue
+            # A number running up to the end of the chunk may go on in the next one.
+            if end < len(self.buffer) or not self._read():
+                self.position = end
+                return value
+
+
+class MultipartReader(object):
+    """
+    Reads the parts of a multipart/form-data body one after the other from a file-like object, holding only a
+    chunk of the input in memory, so that each part can be handled as it arrives. Malformed bodies raise a
+    ``MalformedRequestBody``.
+
+    Users should not need to consume this directly.
+    """
+    CHUNK_SIZE = 64 * 1024
+    MAX_HEADER_BYTES = 8 * 1024
+
+    def __init__(self, body, boundary, content_length=None):
+        """
+        :param body: The body to read.
+        :type body: file
+        :param boundary: The boundary of the parts, from the Content-Type header.
+        :type boundary: bytes
+        :param content_length: The number of bytes to read from the body, or None to read it to its end.
+        :type content_length: int | NoneType
+        """
+        self.body = body
+        self.delimiter = b'\r\n--' + boundary
+        self.remaining = content_length
+        # The first delimiter may open the body, without the line break before it.
+        self.buffer = b'\r\n'
+
+    def parts(self):
+        """
+        :return: The parts of the body. Each part has to be consumed (or skipped) before the next one is read.
+        :rtype: iterator[MultipartPart]
+        """
+        for _ in self._chunks():
+            pass  # The preamble.
+        while True:
+            while len(self.buffer) < 2 and self._read():
+                pass
+            if self.buffer[:2] == b'--':
+                return
+            elif self.buffer[:2] != b'\r\n':
+                raise MalformedRequestBody('Invalid multipart body')
+            self.buffer = self.buffer[2:]
+            part = MultipartPart(self._headers(), self._chunks())
+            yield part
+            for _ in part:
+                pass
+
+    def _read(self):
+        if self.remaining is not None:
+            data = self.body.read(min(self.CHUNK_SIZE, self.remaining)) if self.remaining else b''
+            self.remaining -= len(data)
+        else:
+            data = self.body.read(self.CHUNK_SIZE)
+        self.buffer += data
+        return bool(data)
+
+    def _headers(self):
+        while True:
+            if self.buffer[:2] == b'\r\n':
+                block, self.buffer = b'', self.buffer[2:]
+                break
+            end = self.buffer.find(b'\r\n\r\n')
+            if end >= 0:
+                block, self.buffer = self.buffer[:end], self.buffer[end + 4:]
+                break
+            elif len(self.buffer) > self.MAX_HEADER_BYTES or not self._read():
+                raise MalformedRequestBody('Invalid multipart body')
+        headerlist = []
+        for line in block.decode('utf-8', 'replace').split('\r\n'):
+            name, separator, value = line.partition(':')
+            if not separator:
+                raise MalformedRequestBody('Invalid multipart body')
+            headerlist.append((name.strip(), value.strip()))
+        return headerlist
+
+    def _chunks(self):
+        # The data up to the next delimiter (which is consumed), holding back what may be the start of it.
+        delimiter = self.delimiter
+        while True:
+            end = self.buffer.find(delimiter)
+            if end >= 0:
+                data, self.buffer = self.buffer[:end], self.buffer[end + len(delimiter):]
+                if data:
+                    yield data
+                return
+            keep = len(delimiter) - 1
+            if len(self.buffer) > keep:
+                data, self.buffer = self.buffer[:-keep], self.buffer[-keep:]
+                yield data
+            if not self._read():
+                raise MalformedRequestBody('Invalid multipart body')
+
+
+class MultipartPart(object):
+    """
+    A part of a multipart/form-data body, iterating over the chunks of its content as they are read.
+
+    Users should not need to consume this directly.
+    """
+    __slots__ = ('name', 'filename', 'content_type', 'headerlist', '_chunks')
+
+    def __init__(self, headerlist, chunks):
+        self.headerlist = headerlist
+        self._chunks = chunks
+        headers = dict((name.lower(), value) for name, value in headerlist)
+        disposition = _header_parameters(headers.get('content-disposition', ''))
+        self.name = disposition.get('name')
+        self.filename = disposition.get('filename')
+        self.content_type = headers.get('content-type')
+
+    def __iter__(self):
+        return self._chunks
+
+    def read(self, max_length):
+        """
+        :return: The whole content of the part.
+        :rtype: bytes
+        :raises RequestBodyTooLarge: If it is longer than ``max_length``.
+        """
+        data = []
+        length = 0
+        for chunk in self._chunks:
+            length += len(chunk)
+            if length > max_length:
+                message = "Form field '{0}' of (at least) {1} bytes exceeds the limit of {2} bytes".format(
+                    self.name, length, max_length
+                )
+                raise RequestBodyTooLarge(length, max_length, message)
+            data.append(chunk)
+        return b''.join(data)
 
 
 class BottleOutgoingResponse(OutgoingResponse):
     """
-    The Outgoing Response wrapper fed into Bravado Core.
+    The Outgoing Response wrapper responses are validated through.
+
+    The payload returned by the route callback is encoded lazily and at most once;
+    the plugin reuses ``raw_bytes`` as the body it sends. The content type and headers
+    are likewise looked up once.
 
     Users should not need to consume this class directly.
     """
-    def __init__(self, bottle_response, response_json):
+    # Slots, as in BottleIncomingRequest.
+    __slots__ = ('response', 'response_json', 'json_encoder', '_raw_bytes', '_text', '_content_type', '_headers')
+
+    def __init__(self, bottle_response, response_json, json_encoder=None):
         self.response = bottle_response
         self.response_json = response_json
+        self.json_encoder = json_encoder
+        self._raw_bytes = None
+        self._text = None
+        self._content_type = None
+        self._headers = None
 
     def json(self):
         return self.response_json
 
     @property
     def content_type(self):
-        return self.response.content_type if self.response.content_type else 'application/json'
+        if self._content_type is None:
+            self._content_type = self.response.content_type or 'application/json'
+        return self._content_type
 
     @property
     def headers(self):
-        return self.response.headers
+        # Bottle builds a new HeaderDict view on every access.
+        if self._headers is None:
+            self._headers = self.response.headers
+        return self._headers
 
     @property
     def raw_bytes(self):
-        if not self.response.body:
-            return b''
-        elif isinstance(self.response.body, string_types):
-            return self.response.body.encode('utf-8', 'ignore')
-        elif isinstance(self.response.body, binary_type):
-            return self.response.body
-        else:
-            # TODO: Unsure if this is quite the correct thing to do.
-            return str(self.response.body).encode('utf-8', 'ignore')
+        if self._raw_bytes is None:
+            payload = self.response_json
+            if not payload and not isinstance(payload, (dict, list)):
+                self._raw_bytes = b''
+            elif isinstance(payload, binary_type):
+                self._raw_bytes = payload
+            elif isinstance(payload, string_types):
+                self._raw_bytes = payload.encode('utf-8', 'ignore')
+            elif isinstance(payload, (dict, list)):
+                self._raw_bytes = _to_json_bytes(payload, self.json_encoder)
+            elif hasattr(payload, 'read') or hasattr(payload, '__iter__'):
+                # Files and iterators are left for Bottle to send; reading them here would consume them.
+                self._raw_bytes = b''
+            else:
+                # TODO: Unsure if this is quite the correct thing to do.
+                self._raw_bytes = str(payload).encode('utf-8', 'ignore')
+        return self._raw_bytes
 
     @property
     def text(self):
-        if not self.response.body:
-            return ''
-        elif isinstance(self.response.body, string_types):
-            return self.response.body
-        elif isinstance(self.response.body, binary_type):
-            return self.response.body.decode('utf-8', 'ignore')
-        else:
-            # TODO: Unsure if this is quite the correct thing to do.
-            return str(self.response.body)
+        # As before, this is the body set on Bottle's response itself rather than the callback's
+        # payload, so operations whose responses declare no schema may still return one.
+        if self._text is None:
+            body = self.response.body
+            if not body:
+                self._text = ''
+            elif isinstance(body, binary_type):
+                self._text = body.decode('utf-8', 'ignore')
+            elif isinstance(body, string_types):
+                self._text = body
+            else:
+                self._text = ''
+        return self._text
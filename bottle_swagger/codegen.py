@@ -0,0 +1,549 @@
+"""
+The "compiled" validation engine: Python source generated from the Swagger schemas of each operation,
+compiled once and called directly, instead of walking the schemas with jsonschema on every request.
+
+Users should not need to consume this module directly; select the engine with the ``validation_engine``
+option of ``SwaggerPlugin``.
+"""
+import re
+import numbers
+import six
+from six import string_types, integer_types
+from bravado_core.content_type import APP_JSON
+from bravado_core.param import cast_request_param
+from jsonschema import FormatError, ValidationError
+
+# Keywords the generated validators check themselves. Schemas using any other (validating) keyword, e.g.
+# "discriminator", "anyOf" or "patternProperties", are checked by the fallback validator instead.
+GENERATED_KEYWORDS = frozenset([
+    'type', 'format', 'enum', 'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum', 'multipleOf',
+    'minLength', 'maxLength', 'pattern', 'items', 'minItems', 'maxItems', 'uniqueItems',
+    'properties', 'required', 'additionalProperties', 'minProperties', 'maxProperties', 'allOf',
+    # Not validated at all.
+    'name', 'in', 'description', 'title', 'default', 'example', 'readOnly', 'externalDocs', 'xml',
+    'collectionFormat', 'allowEmptyValue'
+])
+TYPE_CHECKS = {
+    'string': "isinstance({0}, string_types)",
+    'integer': "isinstance({0}, integer_types) and not isinstance({0}, bool)",
+    'number': "isinstance({0}, Number) and not isinstance({0}, bool)",
+    'boolean': "isinstance({0}, bool)",
+    'object': "isinstance({0}, dict)",
+    'array': "isinstance({0}, list)",
+    'null': "{0} is None",
+}
+CAST_PARAM_TYPES = ('integer', 'number', 'boolean')
+SIMPLE_PARAM_LOCATIONS = {'path': 'path', 'query': 'query', 'header': 'headers', 'formData': 'form'}
+
+
+def _invalid(message, keyword, schema, instance):
+    return ValidationError(
+        message, validator=keyword, validator_value=schema.get(keyword), instance=instance, schema=schema
+    )
+
+
+def _equal(one, two):
+    # Like jsonschema, don't consider True and 1 (or False and 0) to be equal.
+    return one == two and isinstance(one, bool) == isinstance(two, bool)
+
+
+def _in_enum(instance, enum):
+    return any(_equal(instance, value) for value in enum)
+
+
+def _has_duplicates(items):
+    seen = []
+    for item in items:
+        if any(_equal(item, other) for other in seen):
+            return True
+        seen.append(item)
+    return False
+
+
+def _not_multiple_of(instance, divisor):
+    if isinstance(divisor, float):
+        quotient = instance / divisor
+        try:
+            return int(quotient) != quotient
+        except OverflowError:
+            return True
+    return bool(instance % divisor)
+
+
+def _extras_message(extras):
+    return "Additional properties are not allowed ({0} {1} unexpected)".format(
+        ", ".join(repr(extra) for extra in sorted(extras)), "was" if len(extras) == 1 else "were"
+    )
+
+
+class _SourceWriter(object):
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+
+    def line(self, text):
+        self.lines.append("    " * self.level + text)
+
+    def indent(self):
+        self.level += 1
+
+    def dedent(self):
+        self.level -= 1
+
+    def source(self):
+        return "\n".join(self.lines) + "\n"
+
+
+class _Generator(object):
+    """
+    Keeps the namespace generated functions are compiled in, handing out names for the constants
+    (schemas, enums, patterns, helper callables) the generated source refers to.
+    """
+    def __init__(self):
+        self.namespace = {
+            'ValidationError': ValidationError,
+            'FormatError': FormatError,
+            'Number': numbers.Number,
+            'string_types': string_types,
+            'integer_types': integer_types,
+            'invalid': _invalid,
+            'in_enum': _in_enum,
+            'has_duplicates': _has_duplicates,
+            'not_multiple_of': _not_multiple_of,
+            'extras_message': _extras_message,
+        }
+        self._constant_names = {}
+        self._counter = 0
+
+    def unique(self, prefix):
+        self._counter += 1
+        return "{}_{}".format(prefix, self._counter)
+
+    def constant(self, value, prefix='constant'):
+        # Keyed by identity: schemas are shared dicts, and equal but distinct objects are fine to duplicate.
+        key = (prefix, id(value))
+        try:
+            return self._constant_names[key][0]
+        except KeyError:
+            name = self.unique(prefix)
+            self.namespace[name] = value
+            # Keep a reference, so the id stays unique while we are generating.
+            self._constant_names[key] = (name, value)
+            return name
+
+    def compile(self, writer, function_name, filename):
+        code = compile(writer.source(), filename, 'exec')
+        six.exec_(code, self.namespace)
+        return self.namespace[function_name]
+
+
+class SchemaValidatorGenerator(_Generator):
+    """
+    Generates a validator function for a Swagger schema object, following bravado-core's (Swagger 2.0) flavour
+    of JSON schema draft 4. Every schema reached through a ``$ref`` gets its own function, so recursive schemas
+    are supported; everything else is checked inline.
+
+    Unlike jsonschema, the generated validators raise the first error they find rather than the "best" one,
+    so for values with several problems the reported error may differ.
+    """
+    def __init__(self, swagger_spec, fallback_compiler):
+        super(SchemaValidatorGenerator, self).__init__()
+        self.swagger_spec = swagger_spec
+        self.fallback_compiler = fallback_compiler
+        self.format_checker = swagger_spec.format_checker
+        self.namespace['format_checker'] = self.format_checker
+        self._function_names = {}
+        self._pending = []
+
+    def generate(self, schema):
+        """
+        :param schema: The schema object (or parameter/header spec) to generate a validator for.
+        :type schema: dict
+        :return: The generated validator, raising a ``jsonschema.ValidationError`` for invalid values.
+        :rtype: object -> NoneType
+        """
+        root_name = self._function_for(self.swagger_spec.deref(schema))
+        writer = _SourceWriter()
+        while self._pending:
+            function_name, function_schema = self._pending.pop()
+            writer.line("def {}(instance):".format(function_name))
+            writer.indent()
+            self._emit_checks(writer, function_schema, 'instance')
+            writer.line("return None")
+            writer.dedent()
+            writer.line("")
+        return self.compile(writer, root_name, '<bottle_swagger generated validator>')
+
+    def _function_for(self, schema):
+        try:
+            return self._function_names[id(schema)][0]
+        except KeyError:
+            function_name = self.unique('validate')
+            self._function_names[id(schema)] = (function_name, schema)
+            self._pending.append((function_name, schema))
+            return function_name
+
+    def _is_generated(self, schema):
+        for key, value in schema.items():
+            if key == 'x-sensitive' and value:
+                # The fallback validators scrub sensitive values from their error messages.
+                return False
+            elif key == 'required' and not isinstance(value, (bool, list)):
+                return False
+            elif key == 'items' and not isinstance(value, dict):
+                return False
+            elif key not in GENERATED_KEYWORDS and not key.startswith('x-'):
+                return False
+        types = schema.get('type')
+        types = types if isinstance(types, list) else [types]
+        return all(schema_type is None or schema_type in TYPE_CHECKS for schema_type in types)
+
+    def _emit_subschema(self, writer, schema, var, path_item):
+        """Check ``var`` against a subschema, adding ``path_item`` to the path of the errors it raises."""
+        writer.line("try:")
+        writer.indent()
+        if isinstance(schema, dict) and '$ref' in schema:
+            writer.line("{}({})".format(self._function_for(self.swagger_spec.deref(schema)), var))
+        else:
+            self._emit_checks(writer, self.swagger_spec.deref(schema), var)
+            writer.line("pass")
+        writer.dedent()
+        writer.line("except ValidationError as error:")
+        writer.indent()
+        writer.line("error.path.appendleft({})".format(path_item))
+        writer.line("raise")
+        writer.dedent()
+
+    def _emit_checks(self, writer, schema, var):
+        if not self._is_generated(schema):
+            fallback = self.fallback_compiler(self.swagger_spec, schema)
+            if fallback is not None:
+                writer.line("{}({})".format(self.constant(fallback, 'fallback'), var))
+            return
+
+        schema_name = self.constant(schema, 'schema')
+        is_param = 'in' in schema
+        # bravado-core skips the type (and format) checks of missing parameters and nullable values.
+        none_allowed = is_param or bool(schema.get('x-nullable', False))
+
+        def raise_invalid(message_expression, keyword):
+            writer.line("raise invalid({}, {!r}, {}, {})".format(message_expression, keyword, schema_name, var))
+
+        if is_param and schema.get('required') is True:
+            writer.line("if {} is None:".format(var))
+            writer.indent()
+            raise_invalid(repr("{0} is a required parameter.".format(schema['name'])), 'required')
+            writer.dedent()
+
+        if 'type' in schema:
+            types = schema['type'] if isinstance(schema['type'], list) else [schema['type']]
+            condition = " or ".join("({})".format(TYPE_CHECKS[schema_type].format(var)) for schema_type in types)
+            if none_allowed:
+                condition = "{} is None or {}".format(var, condition)
+            writer.line("if not ({}):".format(condition))
+            writer.indent()
+            raise_invalid("'%r is not of type %s' % ({}, {!r})".format(
+                var, ", ".join(repr(schema_type) for schema_type in types)
+            ), 'type')
+            writer.dedent()
+
+        if 'enum' in schema:
+            enum_name = self.constant(schema['enum'], 'enum')
+            skip_none = schema.get('x-nullable', False) or (is_param and not schema.get('required', False))
+            if schema.get('type') == 'array':
+                if skip_none:
+                    writer.line("if {} is not None:".format(var))
+                    writer.indent()
+                item_var = self.unique('item')
+                writer.line("for {} in {}:".format(item_var, var))
+                writer.indent()
+                writer.line("if not in_enum({}, {}):".format(item_var, enum_name))
+                writer.indent()
+                writer.line("raise invalid('%r is not one of %r' % ({0}, {1}), 'enum', {2}, {0})".format(
+                    item_var, enum_name, schema_name
+                ))
+                writer.dedent()
+                writer.dedent()
+                if skip_none:
+                    writer.dedent()
+            else:
+                condition = "not in_enum({}, {})".format(var, enum_name)
+                if skip_none:
+                    condition = "{} is not None and {}".format(var, condition)
+                writer.line("if {}:".format(condition))
+                writer.indent()
+                raise_invalid("'%r is not one of %r' % ({}, {})".format(var, enum_name), 'enum')
+                writer.dedent()
+
+        if 'format' in schema and schema['format'] in self.format_checker.checkers:
+            condition = "{} is not None".format(var) if none_allowed else "True"
+            writer.line("if {}:".format(condition))
+            writer.indent()
+            writer.line("try:")
+            writer.indent()
+            writer.line("format_checker.check({}, {!r})".format(var, schema['format']))
+            writer.dedent()
+            writer.line("except FormatError as error:")
+            writer.indent()
+            raise_invalid("error.message", 'format')
+            writer.dedent()
+            writer.dedent()
+
+        numeric_keywords = ('minimum', 'maximum', 'multipleOf')
+        if any(keyword in schema for keyword in numeric_keywords):
+            writer.line("if {}:".format(TYPE_CHECKS['number'].format(var)))
+            writer.indent()
+            if 'minimum' in schema:
+                exclusive = schema.get('exclusiveMinimum', False)
+                writer.line("if {} {} {!r}:".format(var, "<=" if exclusive else "<", schema['minimum']))
+                writer.indent()
+                raise_invalid("'%r is less than {}the minimum of %r' % ({}, {!r})".format(
+                    "or equal to " if exclusive else "", var, schema['minimum']
+                ), 'minimum')
+                writer.dedent()
+            if 'maximum' in schema:
+                exclusive = schema.get('exclusiveMaximum', False)
+                writer.line("if {} {} {!r}:".format(var, ">=" if exclusive else ">", schema['maximum']))
+                writer.indent()
+                raise_invalid("'%r is greater than {}the maximum of %r' % ({}, {!r})".format(
+                    "or equal to " if exclusive else "", var, schema['maximum']
+                ), 'maximum')
+                writer.dedent()
+            if 'multipleOf' in schema:
+                writer.line("if not_multiple_of({}, {!r}):".format(var, schema['multipleOf']))
+                writer.indent()
+                raise_invalid("'%r is not a multiple of %r' % ({}, {!r})".format(var, schema['multipleOf']),
+                              'multipleOf')
+                writer.dedent()
+            writer.dedent()
+
+        string_keywords = ('minLength', 'maxLength', 'pattern')
+        if any(keyword in schema for keyword in string_keywords):
+            writer.line("if {}:".format(TYPE_CHECKS['string'].format(var)))
+            writer.indent()
+            if 'minLength' in schema:
+                writer.line("if len({}) < {!r}:".format(var, schema['minLength']))
+                writer.indent()
+                raise_invalid("'%r is too short' % ({},)".format(var), 'minLength')
+                writer.dedent()
+            if 'maxLength' in schema:
+                writer.line("if len({}) > {!r}:".format(var, schema['maxLength']))
+                writer.indent()
+                raise_invalid("'%r is too long' % ({},)".format(var), 'maxLength')
+                writer.dedent()
+            if 'pattern' in schema:
+                pattern_name = self.constant(re.compile(schema['pattern']), 'pattern')
+                writer.line("if not {}.search({}):".format(pattern_name, var))
+                writer.indent()
+                raise_invalid("'%r does not match %r' % ({}, {}.pattern)".format(var, pattern_name), 'pattern')
+                writer.dedent()
+            writer.dedent()
+
+        array_keywords = ('items', 'minItems', 'maxItems', 'uniqueItems')
+        if any(keyword in schema for keyword in array_keywords):
+            writer.line("if {}:".format(TYPE_CHECKS['array'].format(var)))
+            writer.indent()
+            if 'minItems' in schema:
+                writer.line("if len({}) < {!r}:".format(var, schema['minItems']))
+                writer.indent()
+                raise_invalid("'%r is too short' % ({},)".format(var), 'minItems')
+                writer.dedent()
+            if 'maxItems' in schema:
+                writer.line("if len({}) > {!r}:".format(var, schema['maxItems']))
+                writer.indent()
+                raise_invalid("'%r is too long' % ({},)".format(var), 'maxItems')
+                writer.dedent()
+            if schema.get('uniqueItems'):
+                writer.line("if has_duplicates({}):".format(var))
+                writer.indent()
+                raise_invalid("'%r has non-unique elements' % ({},)".format(var), 'uniqueItems')
+                writer.dedent()
+            if 'items' in schema:
+                index_var, item_var = self.unique('index'), self.unique('item')
+                writer.line("for {}, {} in enumerate({}):".format(index_var, item_var, var))
+                writer.indent()
+                self._emit_subschema(writer, schema['items'], item_var, index_var)
+                writer.dedent()
+            writer.dedent()
+
+        object_keywords = ('properties', 'additionalProperties', 'minProperties', 'maxProperties')
+        if any(keyword in schema for keyword in object_keywords) or isinstance(schema.get('required'), list):
+            self._emit_object_checks(writer, schema, var, raise_invalid)
+
+        for subschema in schema.get('allOf', []):
+            if '$ref' in subschema:
+                writer.line("{}({})".format(self._function_for(self.swagger_spec.deref(subschema)), var))
+            else:
+                self._emit_checks(writer, self.swagger_spec.deref(subschema), var)
+
+    def _emit_object_checks(self, writer, schema, var, raise_invalid):
+        writer.line("if {}:".format(TYPE_CHECKS['object'].format(var)))
+        writer.indent()
+        if 'minProperties' in schema:
+            writer.line("if len({}) < {!r}:".format(var, schema['minProperties']))
+            writer.indent()
+            raise_invalid("'%r does not have enough properties' % ({},)".format(var), 'minProperties')
+            writer.dedent()
+        if 'maxProperties' in schema:
+            writer.line("if len({}) > {!r}:".format(var, schema['maxProperties']))
+            writer.indent()
+            raise_invalid("'%r has too many properties' % ({},)".format(var), 'maxProperties')
+            writer.dedent()
+        if isinstance(schema.get('required'), list):
+            for property_name in schema['required']:
+                writer.line("if {!r} not in {}:".format(property_name, var))
+                writer.indent()
+                raise_invalid(repr("{0!r} is a required property".format(property_name)), 'required')
+                writer.dedent()
+
+        properties = self.swagger_spec.deref(schema.get('properties', {}))
+        for property_name, property_schema in properties.items():
+            property_var = self.unique('value')
+            writer.line("if {!r} in {}:".format(property_name, var))
+            writer.indent()
+            writer.line("{} = {}[{!r}]".format(property_var, var, property_name))
+            self._emit_subschema(writer, property_schema, property_var, repr(property_name))
+            writer.dedent()
+
+        additional_properties = schema.get('additionalProperties', True)
+        if additional_properties is not True:
+            properties_name = self.constant(frozenset(properties), 'properties')
+            key_var = self.unique('key')
+            if additional_properties is False:
+                writer.line("extras = [{0} for {0} in {1} if {0} not in {2}]".format(key_var, var, properties_name))
+                writer.line("if extras:")
+                writer.indent()
+                raise_invalid("extras_message(extras)", 'additionalProperties')
+                writer.dedent()
+            else:
+                value_var = self.unique('value')
+                writer.line("for {}, {} in {}.items():".format(key_var, value_var, var))
+                writer.indent()
+                writer.line("if {} not in {}:".format(key_var, properties_name))
+                writer.indent()
+                self._emit_subschema(writer, additional_properties, value_var, key_var)
+                writer.dedent()
+                writer.dedent()
+        writer.dedent()
+
+
+def generate_schema_validator(swagger_spec, schema_object_spec, fallback_compiler):
+    """
+    Generate (and compile) a validator function for values of a Swagger schema object.
+
+    :param swagger_spec: The Bravado Core spec the schema object belongs to.
+    :type swagger_spec: bravado_core.spec.Spec
+    :param schema_object_spec: The schema object (or parameter/header spec) to validate values against.
+    :type schema_object_spec: dict
+    :param fallback_compiler: Builds the validators for (sub)schemas using keywords the generated code doesn't
+        check itself, given the spec and the schema. It may return None for schemas that need no validation.
+    :type fallback_compiler: (bravado_core.spec.Spec, dict) -> ((object -> NoneType) | NoneType)
+    :return: The generated validator, raising a ``jsonschema.ValidationError`` for invalid values.
+    :rtype: object -> NoneType
+    """
+    return SchemaValidatorGenerator(swagger_spec, fallback_compiler).generate(schema_object_spec)
+
+
+def generate_request_unmarshaller(operation_plan):
+    """
+    Generate (and compile) a function unmarshalling (and validating) a request for an operation, with the
+    parameter lookups, casts and validator calls written out one after the other.
+
+    :param operation_plan: The plan of the operation, with its parameter plans (and their validators).
+    :type operation_plan: bottle_swagger.SwaggerOperationPlan
+    :return: A function taking a ``bravado_core.request.IncomingRequest`` and returning the request data.
+    :rtype: bravado_core.request.IncomingRequest -> dict
+    """
+    generator = _Generator()
+    generator.namespace['cast_request_param'] = cast_request_param
+    writer = _SourceWriter()
+    writer.line("def unmarshal_request(incoming_request):")
+    writer.indent()
+    writer.line("request_data = {}")
+    for param_plan in operation_plan.params:
+        name = repr(param_plan.name)
+        attribute = SIMPLE_PARAM_LOCATIONS.get(param_plan.location)
+        if attribute is None or param_plan.param_type in ('array', 'file'):
+            writer.line("request_data[{}] = {}.unmarshal(incoming_request)".format(
+                name, generator.constant(param_plan, 'param')
+            ))
+            continue
+
+        default = 'None' if param_plan.location == 'path' else generator.constant(param_plan.default, 'default')
+        writer.line("value = incoming_request.{}.get({}, {})".format(attribute, name, default))
+        if param_plan.param_type in CAST_PARAM_TYPES:
+            writer.line("value = cast_request_param({!r}, {}, value)".format(param_plan.param_type, name))
+        if not param_plan.required:
+            writer.line("if value is None:")
+            writer.indent()
+            writer.line("request_data[{}] = None".format(name))
+            writer.dedent()
+            writer.line("else:")
+            writer.indent()
+        if param_plan.validator is not None:
+            writer.line("{}(value)".format(generator.constant(param_plan.validator, 'validate')))
+        # Past the validator (or the check above), the value of a required parameter can't be None either.
+        if param_plan.unmarshal_scalar_as_is and (not param_plan.required or param_plan.validator is not None):
+            writer.line("request_data[{}] = value".format(name))
+        else:
+            writer.line("request_data[{}] = {}.unmarshal_value(value)".format(
+                name, generator.constant(param_plan, 'param')
+            ))
+        if not param_plan.required:
+            writer.dedent()
+    if operation_plan.validate_security:
+        writer.line("{}.check_security(request_data)".format(generator.constant(operation_plan, 'operation')))
+    writer.line("return request_data")
+    writer.dedent()
+    return generator.compile(writer, 'unmarshal_request', '<bottle_swagger generated request unmarshaller>')
+
+
+def generate_response_validator(operation_plan):
+    """
+    Generate (and compile) a function validating a response for an operation, dispatching on the status code
+    straight to the validators of the matching response's JSON body and headers.
+
+    :param operation_plan: The plan of the operation, with its response plans (and their validators).
+    :type operation_plan: bottle_swagger.SwaggerOperationPlan
+    :return: A function taking the status code and a ``bravado_core.response.OutgoingResponse``.
+    :rtype: (int, bravado_core.response.OutgoingResponse) -> NoneType
+    """
+    generator = _Generator()
+    writer = _SourceWriter()
+    writer.line("def validate_response(status_code, outgoing_response):")
+    writer.indent()
+    writer.line("status = str(status_code)")
+    statuses = sorted(status for status in operation_plan.responses if status != 'default')
+    for status in statuses + ['default']:
+        response_plan = operation_plan.responses.get(status)
+        if response_plan is None:
+            continue
+        if status != 'default':
+            writer.line("if status == {!r}:".format(status))
+            writer.indent()
+        plan_name = generator.constant(response_plan, 'response')
+        if response_plan.body_spec is not None and APP_JSON in response_plan.produces:
+            writer.line("if outgoing_response.content_type == {!r}:".format(APP_JSON))
+            writer.indent()
+            if response_plan.body_validator is not None:
+                writer.line("{}(outgoing_response.json())".format(
+                    generator.constant(response_plan.body_validator, 'validate')
+                ))
+            else:
+                writer.line("pass")
+            writer.dedent()
+            writer.line("else:")
+            writer.indent()
+            writer.line("{}.validate_body(outgoing_response)".format(plan_name))
+            writer.dedent()
+        else:
+            writer.line("{}.validate_body(outgoing_response)".format(plan_name))
+        if response_plan.header_validators:
+            writer.line("{}.validate_headers(outgoing_response)".format(plan_name))
+        writer.line("return None")
+        if status != 'default':
+            writer.dedent()
+    if 'default' not in operation_plan.responses:
+        writer.line("{}.response_plan(status_code)".format(generator.constant(operation_plan, 'operation')))
+    writer.dedent()
+    return generator.compile(writer, 'validate_response', '<bottle_swagger generated response validator>')
@@ -28,6 +28,7 @@ setup(
         package_data={"bottle_swagger": ["*.png", "*.html", "*.html.st", "*.css", "*.js"]},
         # setup_requires=['sphinx', 'sphinx_rtd_theme'],
         install_requires=REQUIREMENTS,
+        extras_require={"brotli": ["brotli"]},
         tests_require=REQUIREMENTS + ["tox", "webtest"],
         classifiers=[
             'Environment :: Web Environment',
@@ -1,9 +1,36 @@
-from unittest import TestCase
-
-from bottle import Bottle, redirect, request, HTTPResponse, debug
-from bottle_swagger import SwaggerPlugin
+import os
+import sys
+import json
+import zlib
+import logging
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import TestCase, skipIf
+from wsgiref.util import setup_testing_defaults
+
+from bottle import Bottle, redirect, request, HTTPResponse, HTTPError, debug
+from bottle import response as bottle_response
+from bravado_core.exception import SwaggerSecurityValidationError
+from bravado_core.request import IncomingRequest
+from bravado_core.response import OutgoingResponse
+from bravado_core.spec import Spec
+from bravado_core.validate import validate_security_object
+from jsonschema import ValidationError
+from bottle_swagger import (
+    SwaggerPlugin, SwaggerMetrics, SwaggerSecurityPlan, CredentialCache, JSONArrayReader, MultipartReader,
+    MalformedRequestBody, LazyModel, BottleIncomingRequest, BottleOutgoingResponse, load_swagger_ui_asset,
+    SWAGGER_UI_VERSION
+)
 from webtest import TestApp
 
+import bottle_swagger
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2, without the "futures" backport.
+    ThreadPoolExecutor = None
+
 
 class TestBottleSwagger(TestCase):
     VALID_JSON = {"id": "123", "name": "foo"}
@@ -224,6 +251,190 @@ class TestBottleSwagger(TestCase):
         )
         self.assertEqual(response.status_int, 200)
 
+    def test_scalar_http_response_body_is_json_encoded(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/greeting": {
+                "get": {"responses": {"200": {"description": "", "schema": {"type": "string"}}}}
+            }
+        })
+        swagger_plugin = self._make_custom_swagger_plugin(swagger_def)
+        response = self._test_request(swagger_plugin=swagger_plugin, url='/greeting',
+                                      response_json=HTTPResponse(body="hello"))
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(response.body, b'"hello"')
+
+    def test_response_serialized_once(self):
+        import bottle_swagger
+        original_json_dumps = bottle_swagger.json_dumps
+        dumped = []
+
+        def counting_json_dumps(obj, *args, **kwargs):
+            dumped.append(obj)
+            return original_json_dumps(obj, *args, **kwargs)
+
+        bottle_swagger.json_dumps = counting_json_dumps
+        try:
+            for response_json in (self.VALID_JSON, HTTPResponse(body=self.VALID_JSON)):
+                del dumped[:]
+                response = self._test_request(response_json=response_json)
+                self.assertEqual(response.status_int, 200)
+                self.assertEqual(response.json, self.VALID_JSON)
+                self.assertEqual(response.content_type, 'application/json')
+                self.assertEqual(int(response.headers['Content-Length']), len(response.body))
+                self.assertEqual(dumped, [self.VALID_JSON])
+        finally:
+            bottle_swagger.json_dumps = original_json_dumps
+
+    def test_custom_json_encoder_and_decoder(self):
+        encoded, decoded = [], []
+
+        def json_encoder(obj):
+            encoded.append(obj)
+            return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+        def json_decoder(body):
+            self.assertIsInstance(body, bytes)
+            decoded.append(body)
+            return json.loads(body.decode('utf-8'))
+
+        swagger_plugin = self._make_swagger_plugin(json_encoder=json_encoder, json_decoder=json_decoder)
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST')
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.body, b'{"id":"123","name":"foo"}')
+        self.assertEqual(len(decoded), 1)
+
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST', request_json=self.INVALID_JSON)
+        self._assert_error_response(response, 400)
+        self.assertNotIn(b' ', response.body.split(b'"message"')[0])
+        self.assertEqual(encoded[-1]['code'], 400)
+
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+        response = TestApp(bottle_app).get(SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_SUBURL)
+        self.assertEqual(response.json, self.SWAGGER_DEF)
+        self.assertEqual(encoded[-1]['swagger'], "2.0")
+
+    def test_validators_compiled_once_per_operation(self):
+        import bottle_swagger
+        original_get_validator_type = bottle_swagger.get_validator_type
+        compiled = []
+
+        def counting_get_validator_type(swagger_spec):
+            compiled.append(swagger_spec)
+            return original_get_validator_type(swagger_spec)
+
+        bottle_swagger.get_validator_type = counting_get_validator_type
+        try:
+            bottle_app = Bottle()
+            bottle_app.install(self._make_swagger_plugin())
+
+            @bottle_app.post("/thing")
+            def post_thing():
+                return request.json
+
+            test_app = TestApp(bottle_app)
+            self.assertEqual(test_app.post_json("/thing", self.VALID_JSON).status_int, 200)
+            # One for the body parameter, one for the 200 response.
+            self.assertEqual(len(compiled), 2)
+            for _ in range(3):
+                self.assertEqual(test_app.post_json("/thing", self.VALID_JSON).status_int, 200)
+                self._assert_error_response(test_app.post_json("/thing", self.INVALID_JSON, expect_errors=True), 400)
+            self.assertEqual(len(compiled), 2)
+        finally:
+            bottle_swagger.get_validator_type = original_get_validator_type
+
+    def test_scalar_parameter_fast_path(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/thing/{thing_kind}": {
+                "get": {
+                    "parameters": [
+                        {"name": "thing_kind", "in": "path", "required": True, "type": "string",
+                         "enum": ["small", "large"]},
+                        {"name": "limit", "in": "query", "type": "integer", "format": "int32",
+                         "minimum": 1, "maximum": 100, "default": 10},
+                        {"name": "name", "in": "query", "type": "string", "pattern": "^[a-z]+$", "maxLength": 8},
+                        {"name": "X-Trace", "in": "header", "type": "boolean"}
+                    ],
+                    "responses": {"200": {"description": "", "schema": {"$ref": "#/definitions/Thing"}}}
+                }
+            }
+        })
+        import bottle_swagger
+        original_get_validator_type = bottle_swagger.get_validator_type
+        compiled = []
+
+        def counting_get_validator_type(swagger_spec):
+            compiled.append(swagger_spec)
+            return original_get_validator_type(swagger_spec)
+
+        bottle_swagger.get_validator_type = counting_get_validator_type
+        try:
+            bottle_app = Bottle()
+            swagger_plugin = self._make_custom_swagger_plugin(swagger_def)
+            bottle_app.install(swagger_plugin)
+
+            @bottle_app.get("/thing/<thing_kind>")
+            def get_thing(thing_kind):
+                return {"id": thing_kind, "name": json.dumps(request.swagger_data, sort_keys=True)}
+
+            test_app = TestApp(bottle_app)
+            response = test_app.get("/thing/small?limit=5&name=foo", headers={"X-Trace": "true"})
+            self.assertEqual(json.loads(response.json['name']), {
+                "X-Trace": True, "limit": 5, "name": "foo", "thing_kind": "small"
+            })
+            response = test_app.get("/thing/large")
+            self.assertEqual(json.loads(response.json['name']), {
+                "X-Trace": None, "limit": 10, "name": None, "thing_kind": "large"
+            })
+            for url in ("/thing/medium", "/thing/small?limit=0", "/thing/small?limit=101", "/thing/small?limit=x",
+                        "/thing/small?name=Foo", "/thing/small?name=foofoofoo"):
+                self._assert_error_response(test_app.get(url, expect_errors=True), 400)
+            # Only the response schema needed a jsonschema validator (and not even that with generated code).
+            self.assertEqual(len(compiled), 0 if swagger_plugin.validation_engine == 'compiled' else 1)
+        finally:
+            bottle_swagger.get_validator_type = original_get_validator_type
+
+    def test_scalar_parameter_keywords_of_other_types(self):
+        # jsonschema ignores keywords that don't apply to the type of the value, and so should the fast path.
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/thing": {
+                "get": {
+                    "parameters": [
+                        {"name": "limit", "in": "query", "type": "integer", "minLength": 2, "pattern": "^x$"},
+                        {"name": "name", "in": "query", "type": "string", "minimum": 5, "maxLength": 3}
+                    ],
+                    "responses": {"200": {"description": "", "schema": {"$ref": "#/definitions/Thing"}}}
+                }
+            }
+        })
+        swagger_plugin = self._make_custom_swagger_plugin(swagger_def)
+        response = self._test_request(swagger_plugin=swagger_plugin, url="/thing?limit=1&name=foo",
+                                      route_url="/thing")
+        self.assertEqual(response.status_int, 200)
+        response = self._test_request(swagger_plugin=swagger_plugin, url="/thing?limit=1&name=foobar",
+                                      route_url="/thing")
+        self._assert_error_response(response, 400)
+
+    def test_nullable_enum_array(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/flags": {
+                "post": {
+                    "parameters": [{"name": "flags", "in": "body", "required": True, "schema": {
+                        "type": "object", "properties": {"flags": {
+                            "type": "array", "items": {"type": "string"}, "enum": ["on", "off"], "x-nullable": True
+                        }}
+                    }}],
+                    "responses": {"200": {"description": ""}}
+                }
+            }
+        })
+        swagger_plugin = self._make_custom_swagger_plugin(swagger_def)
+        for flags, expected_status in ((["on"], 200), (None, 200), (["maybe"], 400)):
+            response = self._test_request(swagger_plugin=swagger_plugin, method='POST', url='/flags',
+                                          request_json={"flags": flags}, response_json='')
+            self.assertEqual(response.status_int, expected_status)
+
     def test_invalid_request(self):
         response = self._test_request(method='POST', request_json=self.INVALID_JSON)
         self._assert_error_response(response, 400)
@@ -244,6 +455,529 @@ class TestBottleSwagger(TestCase):
         self._test_disable_validation(validate_requests=False, validate_responses=False, expected_request_status=200,
                                       expected_response_status=200)
 
+    def test_response_validation_sampling(self):
+        never = self._make_swagger_plugin(response_validation_sample_rate=0.0)
+        response = self._test_request(swagger_plugin=never, response_json=self.INVALID_JSON)
+        self.assertEqual(response.status_int, 200)
+
+        only_get_thing = self._make_swagger_plugin(
+            response_validation_sample_rate=0.0, response_validation_sample_rates={"get_thing": 1.0}
+        )
+        response = self._test_request(swagger_plugin=only_get_thing, response_json=self.INVALID_JSON)
+        self._assert_error_response(response, 500)
+        response = self._test_request(
+            swagger_plugin=only_get_thing, url="/thing_query?thing_id=1", route_url="/thing_query",
+            response_json=self.INVALID_JSON
+        )
+        self.assertEqual(response.status_int, 200)
+
+        no_budget = self._make_swagger_plugin(response_validation_time_budget=0.0)
+        response = self._test_request(swagger_plugin=no_budget, response_json=self.INVALID_JSON)
+        self.assertEqual(response.status_int, 200)
+
+        some_budget = self._make_swagger_plugin(response_validation_time_budget=0.5)
+        response = self._test_request(swagger_plugin=some_budget, response_json=self.INVALID_JSON)
+        self._assert_error_response(response, 500)
+
+    def test_unenforced_response_validation(self):
+        swagger_plugin = self._make_swagger_plugin(enforce_response_validation=False)
+        # (TestCase.assertLogs isn't available on Python 2.)
+        records = []
+        handler = logging.Handler(level=logging.WARNING)
+        handler.emit = records.append
+        logger = logging.getLogger('bottle_swagger')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        response = self._test_request(swagger_plugin=swagger_plugin, response_json=self.INVALID_JSON)
+        self.assertEqual([record.levelno for record in records], [logging.WARNING])
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.json, self.INVALID_JSON)
+
+    def test_metrics(self):
+        metrics = SwaggerMetrics()
+        swagger_plugin = self._make_swagger_plugin(metrics=metrics)
+        self.assertEqual(self._test_request(swagger_plugin=swagger_plugin, method='POST').status_int, 200)
+        self.assertEqual(self._test_request(swagger_plugin=swagger_plugin, method='POST').status_int, 200)
+        self._test_request(swagger_plugin=swagger_plugin, method='POST', request_json=self.INVALID_JSON)
+        self._test_request(swagger_plugin=swagger_plugin, response_json=self.INVALID_JSON)
+        self._test_request(swagger_plugin=swagger_plugin, url="/invalid")
+
+        def throw_ex():
+            raise Exception("Exception occurred")
+        self._test_request(swagger_plugin=swagger_plugin, response_json=throw_ex)
+
+        snapshot = metrics.snapshot()
+        post_thing = snapshot['phases']['post_thing']
+        for phase in ('request_validation', 'handler', 'response_validation', 'serialization', 'total'):
+            self.assertEqual(post_thing[phase]['count'], 2)
+            self.assertGreaterEqual(post_thing[phase]['max'], 0.0)
+        self.assertLessEqual(post_thing['handler']['total'], post_thing['total']['total'])
+        self.assertEqual(snapshot['counters'], {
+            'post_thing': {'invalid_request': 1},
+            'get_thing': {'invalid_response': 1, 'exception': 1},
+            None: {'not_found': 1}
+        })
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {'phases': {}, 'counters': {}})
+
+    def test_streamed_array_response(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/things": {
+                "get": {
+                    "responses": {"200": {"description": "", "schema": {
+                        "type": "array", "items": {"$ref": "#/definitions/Thing"}
+                    }}}
+                }
+            }
+        })
+        things = [{"id": str(index), "name": "thing {}".format(index)} for index in range(100)]
+        closed = []
+
+        def make_app(items, **kwargs):
+            swagger_plugin = self._make_custom_swagger_plugin(swagger_def, **kwargs)
+            # Small chunks, so that the items end up spread over several of them.
+            swagger_plugin.STREAM_CHUNK_SIZE = 64
+            bottle_app = Bottle()
+            bottle_app.install(swagger_plugin)
+
+            @bottle_app.get("/things")
+            def get_things():
+                try:
+                    for item in items:
+                        yield item
+                finally:
+                    closed.append(True)
+            return TestApp(bottle_app)
+
+        response = make_app(things).get("/things")
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(response.json, things)
+        self.assertEqual(make_app([]).get("/things").json, [])
+
+        invalid_things = things[:10] + [{"name": "no id"}] + things[10:]
+        metrics = SwaggerMetrics()
+        records = []
+        handler = logging.Handler(level=logging.ERROR)
+        handler.emit = records.append
+        logger = logging.getLogger('bottle_swagger')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        # The body iterator ends (rather than raising into the server), leaving the array unterminated.
+        test_app = make_app(invalid_things, metrics=metrics)
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': '/things'}
+        setup_testing_defaults(environ)
+        statuses = []
+        body = b''.join(test_app.app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+        self.assertEqual(statuses, ['200 OK'])
+        self.assertEqual(json.loads(body.decode('utf-8') + ']'), things[:10])
+        self.assertEqual([record.levelno for record in records], [logging.ERROR])
+        self.assertEqual(list(records[0].args[1].path), [10])
+        self.assertEqual(metrics.snapshot()['counters'], {'get_things': {'invalid_response': 1}})
+        self.assertEqual(len(closed), 3)
+
+        response = make_app(invalid_things, enforce_response_validation=False).get("/things")
+        self.assertEqual(response.json, invalid_things)
+        response = make_app(invalid_things, validate_responses=False).get("/things")
+        self.assertEqual(response.json, invalid_things)
+
+    def test_streamed_request_body(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/things": {
+                "post": {
+                    "tags": ["bulk"],
+                    "parameters": [{
+                        "name": "things", "in": "body", "required": True,
+                        "schema": {"type": "array", "items": {"$ref": "#/definitions/Thing"}, "maxItems": 50}
+                    }],
+                    "responses": {"200": {"description": "", "schema": {"type": "object"}}}
+                }
+            }
+        })
+        seen = []
+        bottle_app = Bottle()
+        bottle_app.install(self._make_custom_swagger_plugin(
+            swagger_def, streamed_request_bodies=['bulk'], use_bravado_models=False
+        ))
+
+        @bottle_app.post("/things")
+        def post_things():
+            things = request.swagger_data['things']
+            self.assertFalse(isinstance(things, list))
+            for thing in things:
+                seen.append(thing['id'])
+            return {"count": len(seen)}
+
+        test_app = TestApp(bottle_app)
+        things = [{"id": str(index), "name": u"th\u00efng {}".format(index)} for index in range(20)]
+        response = test_app.post_json("/things", things)
+        self.assertEqual(response.json, {"count": 20})
+        self.assertEqual(seen, [thing["id"] for thing in things])
+
+        del seen[:]
+        response = test_app.post_json("/things", things[:3] + [{"name": "no id"}] + things[3:], expect_errors=True)
+        self._assert_error_response(response, 400)
+        self.assertEqual(seen, ["0", "1", "2"])
+
+        self._assert_error_response(test_app.post_json("/things", things * 3, expect_errors=True), 400)
+        self._assert_error_response(test_app.post_json("/things", {"id": "1"}, expect_errors=True), 400)
+        response = test_app.post("/things", b'[{"id": "1"}, {"id": ', content_type='application/json',
+                                 expect_errors=True)
+        self.assertEqual(response.status_int, 400)
+
+    def test_request_body_limits(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths=dict(self.SWAGGER_DEF["paths"], **{
+            "/small_thing": {
+                "post": {
+                    "x-max-body-bytes": 40,
+                    "parameters": [{"name": "thing", "in": "body", "required": True,
+                                    "schema": {"$ref": "#/definitions/Thing"}}],
+                    "responses": {"200": {"description": "", "schema": {"$ref": "#/definitions/Thing"}}}
+                }
+            }
+        }))
+        swagger_plugin = self._make_custom_swagger_plugin(swagger_def, max_request_body_bytes=100)
+        large_thing = {"id": "123", "name": "x" * 100}
+
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST', url='/small_thing')
+        self.assertEqual(response.status_int, 200)
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST', url='/small_thing',
+                                      request_json={"id": "123", "name": "x" * 20})
+        self._assert_error_response(response, 413)
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST', request_json=large_thing)
+        self._assert_error_response(response, 413)
+        response = self._test_request(method='POST', request_json=large_thing, response_json=large_thing)
+        self.assertEqual(response.status_int, 200)
+
+        # A chunked body is only read up to the limit.
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+        bottle_app.post("/small_thing", callback=lambda: self.VALID_JSON)
+
+        def post_chunked(chunked_body):
+            environ = {
+                'REQUEST_METHOD': 'POST', 'PATH_INFO': '/small_thing', 'CONTENT_TYPE': 'application/json',
+                'HTTP_TRANSFER_ENCODING': 'chunked', 'wsgi.input': chunked_body
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            b''.join(bottle_app(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+            return statuses
+
+        chunked_body = BytesIO((b'400\r\n' + b'x' * 1024 + b'\r\n') * 1024 + b'0\r\n\r\n')
+        self.assertEqual(post_chunked(chunked_body), ['413 Request Entity Too Large'])
+        self.assertLess(chunked_body.tell(), 2 * (1024 + 8))
+        self.assertEqual(post_chunked(BytesIO(b'5;ext=1\r\n{"id"\r\n8\r\n: "123"}\r\n0\r\n\r\n')), ['200 OK'])
+        self.assertEqual(post_chunked(BytesIO(b'5\r\n{"id": "123"}\r\n0\r\n\r\n')), ['400 Bad Request'])
+        self.assertEqual(post_chunked(BytesIO(b'zz\r\n{}\r\n0\r\n\r\n')), ['400 Bad Request'])
+
+        content_type_plugin = self._make_swagger_plugin(validate_request_content_type=True)
+        response = self._test_request(swagger_plugin=content_type_plugin, method='POST',
+                                      request_json=json.dumps(self.VALID_JSON), content_type='text/plain')
+        self._assert_error_response(response, 415)
+        response = self._test_request(swagger_plugin=content_type_plugin, method='POST', url='/thing_formdata',
+                                      request_json={'thing_id': '123'},
+                                      content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_int, 200)
+        response = self._test_request(swagger_plugin=content_type_plugin, method='POST', url='/thing_formdata',
+                                      request_json=json.dumps({'thing_id': '1'}), content_type='application/json')
+        self._assert_error_response(response, 415)
+        # Not checked by default: this body is simply not found.
+        response = self._test_request(method='POST', request_json=json.dumps(self.VALID_JSON),
+                                      content_type='text/plain')
+        self._assert_error_response(response, 400)
+
+    def test_multipart_uploads(self):
+        swagger_def = dict(self.SWAGGER_DEF, paths={
+            "/avatars": {
+                "post": {
+                    "consumes": ["multipart/form-data"],
+                    "parameters": [
+                        {"name": "user", "in": "formData", "required": True, "type": "string", "maxLength": 8},
+                        {"name": "avatar", "in": "formData", "required": True, "type": "file",
+                         "x-max-file-bytes": 1024, "x-content-types": ["image/*"]}
+                    ],
+                    "responses": {"200": {"description": ""}}
+                }
+            }
+        })
+        received = {}
+
+        def post_avatar(swagger_plugin, fields, upload):
+            bottle_app = Bottle()
+            bottle_app.install(swagger_plugin)
+
+            @bottle_app.post("/avatars")
+            def create_avatar():
+                avatar = request.swagger_data['avatar']
+                received.update(user=request.forms.user, filename=avatar.raw_filename, data=avatar.file.read())
+            return TestApp(bottle_app).post("/avatars", fields, upload_files=[upload], expect_errors=True)
+
+        for stream_multipart_uploads in (True, False):
+            swagger_plugin = self._make_custom_swagger_plugin(
+                swagger_def, stream_multipart_uploads=stream_multipart_uploads
+            )
+            response = post_avatar(swagger_plugin, {"user": "ann"}, ("avatar", "me.png", b"\x89PNG" * 100, "image/png"))
+            self.assertEqual(response.status_int, 200)
+            self.assertEqual(received, {"user": "ann", "filename": "me.png", "data": b"\x89PNG" * 100})
+            response = post_avatar(swagger_plugin, {"user": "ann"}, ("avatar", "me.png", b"x" * 1025, "image/png"))
+            self._assert_error_response(response, 400)
+            self.assertIn("'avatar'", response.json['message'])
+            response = post_avatar(swagger_plugin, {"user": "ann"}, ("avatar", "me.txt", b"x", "text/plain"))
+            self._assert_error_response(response, 415)
+            response = post_avatar(swagger_plugin, {"user": "x" * 9}, ("avatar", "me.png", b"x", "image/png"))
+            self._assert_error_response(response, 400)
+            # Streamed uploads are only checked as they are read, not once more when unmarshalled.
+            plan, = swagger_plugin._operation_plans.values()
+            file_plans = [param_plan for param_plan in plan.params if param_plan.param_type == 'file']
+            self.assertEqual([param_plan.check_uploads for param_plan in file_plans], [not stream_multipart_uploads])
+
+    def test_multipart_reader(self):
+        body = (
+            b'preamble\r\n--frontier\r\nContent-Disposition: form-data; name="user"\r\n\r\nann\r\n'
+            b'--frontier\r\nContent-Disposition: form-data; name="avatar"; filename="a \\"b\\".png"\r\n'
+            b'Content-Type: image/png\r\n\r\n' + b'\r\n--frontie' * 50 + b'\r\n--frontier--\r\n'
+        )
+        reader = MultipartReader(BytesIO(body + b'trailing garbage'), b'frontier', content_length=len(body))
+        reader.CHUNK_SIZE = 7
+        parts = [(part.name, part.filename, part.content_type, b''.join(part)) for part in reader.parts()]
+        self.assertEqual(parts, [
+            ("user", None, None, b"ann"),
+            ("avatar", 'a "b".png', "image/png", b'\r\n--frontie' * 50)
+        ])
+        with self.assertRaises(MalformedRequestBody):
+            list(MultipartReader(BytesIO(body[:-20]), b'frontier').parts())
+
+    @skipIf(sys.version_info < (3, 5), "Coroutines need Python 3.5")
+    def test_async_callbacks(self):
+        namespace = {'request': request}
+        # Not written out as such, since "async def" is a syntax error on Python 2.
+        exec(
+            "async def make_response(response_json):\n"
+            "    return dict(response_json, name=request.query.get('name', 'foo'))",
+            namespace
+        )
+        make_response = namespace['make_response']
+        swagger_plugin = self._make_swagger_plugin(async_callbacks=True)
+
+        response = self._test_request(swagger_plugin=swagger_plugin, url='/thing?name=bar', route_url='/thing',
+                                      response_json=lambda: make_response(self.VALID_JSON))
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.json, {"id": "123", "name": "bar"})
+        response = self._test_request(swagger_plugin=swagger_plugin,
+                                      response_json=lambda: make_response(self.INVALID_JSON))
+        self._assert_error_response(response, 500)
+
+    @skipIf(sys.version_info < (3, 5), "Coroutines need Python 3.5")
+    def test_async_callbacks_event_loops(self):
+        import asyncio
+        loops = []
+        namespace = {'asyncio': asyncio, 'loops': loops}
+        exec(
+            "async def make_response(response_json):\n"
+            "    loops.append(asyncio.get_event_loop())\n"
+            "    return response_json\n"
+            "async def call_app(test_app):\n"
+            "    return test_app.get('/thing', expect_errors=True)",
+            namespace
+        )
+        make_response = namespace['make_response']
+        bottle_app = Bottle()
+        bottle_app.install(self._make_swagger_plugin(async_callbacks=True))
+        bottle_app.get('/thing')(lambda: make_response(self.VALID_JSON))
+        test_app = TestApp(bottle_app)
+
+        # The loop each coroutine ran on is closed again.
+        self.assertEqual(test_app.get('/thing').status_int, 200)
+        self.assertEqual(len(loops), 1)
+        self.assertTrue(loops[0].is_closed())
+
+        # A thread already running an event loop can't block on another coroutine.
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(namespace['call_app'](test_app))
+        finally:
+            loop.close()
+        self._assert_error_response(response, 500)
+        self.assertEqual(len(loops), 1)
+
+    @skipIf(ThreadPoolExecutor is None, "No concurrent.futures")
+    def test_validation_executor(self):
+        submitted = []
+
+        class RecordingExecutor(ThreadPoolExecutor):
+            def submit(self, function, *args, **kwargs):
+                submitted.append(function.__name__)
+                return super(RecordingExecutor, self).submit(function, *args, **kwargs)
+
+        executor = RecordingExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        swagger_plugin = self._make_swagger_plugin(validation_executor=executor, offload_threshold_bytes=100)
+        large_thing = {"id": "123", "name": "x" * 100}
+
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST')
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(submitted, [])
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST', request_json=large_thing,
+                                      response_json=large_thing)
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.json, large_thing)
+        self.assertEqual(submitted, ['_validate_request', 'validate_response'])
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST',
+                                      request_json=dict(self.INVALID_JSON, name="x" * 100))
+        self._assert_error_response(response, 400)
+        response = self._test_request(swagger_plugin=swagger_plugin, response_json=dict(large_thing, id=123))
+        self._assert_error_response(response, 500)
+
+    def test_lazy_unmarshalling(self):
+        swagger_def = dict(self.SWAGGER_DEF, definitions={
+            "Order": {
+                "type": "object",
+                "required": ["id", "customer"],
+                "properties": {
+                    "id": {"type": "string"},
+                    "placed": {"type": "string", "format": "date"},
+                    "note": {"type": "string"},
+                    "customer": {"$ref": "#/definitions/Customer"},
+                    "lines": {"type": "array", "items": {"type": "object", "properties": {
+                        "sku": {"type": "string"}, "quantity": {"type": "integer"}
+                    }}},
+                    "items": {"type": "array", "items": {"type": "string"}}
+                }
+            },
+            "Customer": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}, "vip": {"type": "boolean", "default": False}}
+            }
+        }, paths={
+            "/orders": {
+                "post": {
+                    "parameters": [{"name": "order", "in": "body", "required": True,
+                                    "schema": {"$ref": "#/definitions/Order"}}],
+                    "responses": {"200": {"description": ""}}
+                }
+            }
+        })
+        order = {"id": "1", "placed": "2020-01-31", "customer": {"name": "Ann"},
+                 "lines": [{"sku": "a", "quantity": 2}], "items": ["a"], "extra": [1]}
+        received = {}
+
+        def post_order(swagger_plugin):
+            bottle_app = Bottle()
+            bottle_app.install(swagger_plugin)
+
+            @bottle_app.post("/orders")
+            def create_order():
+                received['order'] = request.swagger_data['order']
+            return TestApp(bottle_app).post_json("/orders", order, expect_errors=True)
+
+        self.assertEqual(post_order(self._make_custom_swagger_plugin(swagger_def)).status_int, 200)
+        eager_order = received['order']
+        lazy_plugin = self._make_custom_swagger_plugin(swagger_def, lazy_unmarshalling=True)
+        self.assertEqual(post_order(lazy_plugin).status_int, 200)
+        lazy_order = received['order']
+
+        self.assertIsInstance(lazy_order, LazyModel)
+        self.assertEqual(lazy_order.placed, eager_order.placed)
+        self.assertEqual(lazy_order["placed"].year, 2020)
+        self.assertIsInstance(lazy_order.customer, LazyModel)
+        self.assertEqual(lazy_order.customer.name, "Ann")
+        self.assertIs(lazy_order.customer.vip, eager_order.customer.vip)
+        self.assertIsNone(lazy_order.note)
+        self.assertEqual(lazy_order.extra, [1])
+        self.assertEqual(sorted(lazy_order), sorted(["id", "placed", "customer", "lines", "items", "extra", "note"]))
+        # Properties take precedence over the dictionary methods of the same names.
+        self.assertEqual(lazy_order.items, eager_order.items)
+        self.assertEqual(lazy_order.items, ["a"])
+        self.assertEqual(lazy_order.get("id"), "1")
+        self.assertEqual(sorted(lazy_order.customer.items()), [("name", "Ann"), ("vip", eager_order.customer.vip)])
+        self.assertRaises(AttributeError, getattr, lazy_order, "missing")
+        self.assertEqual(lazy_order, eager_order)
+        self.assertEqual(type(lazy_order._materialize()).__name__, type(eager_order).__name__)
+
+        post_order(self._make_custom_swagger_plugin(swagger_def, lazy_unmarshalling=True, use_bravado_models=False))
+        self.assertIs(received['order']['customer']['vip'], False)
+        self.assertEqual(received['order']._materialize()['customer'], {"name": "Ann", "vip": False})
+
+        order = {"customer": {"name": "Ann"}}
+        response = post_order(self._make_custom_swagger_plugin(swagger_def, lazy_unmarshalling=True))
+        self._assert_error_response(response, 400)
+
+    def test_request_response_adapters(self):
+        bottle_app = Bottle()
+
+        @bottle_app.get("/thing/<thing_id>")
+        def get_thing(thing_id):
+            incoming_request = BottleIncomingRequest(request)
+            self.assertIs(incoming_request.query, incoming_request.query)
+            self.assertIs(incoming_request.headers, incoming_request.headers)
+            self.assertEqual(incoming_request.path, {"thing_id": thing_id})
+            self.assertEqual(incoming_request.query.get("name"), "foo")
+            self.assertNotIn('bottle.request.forms', request.environ)
+            path_only_request = BottleIncomingRequest(request, locations=frozenset(['path']))
+            self.assertEqual(len(path_only_request.form), 0)
+            self.assertIsNone(path_only_request.json())
+            self.assertNotIn('bottle.request.forms', request.environ)
+            self.assertNotIn('bottle.request.body', request.environ)
+
+            bottle_response.set_header("X-Thing", thing_id)
+            outgoing_response = BottleOutgoingResponse(bottle_response, {"id": thing_id})
+            self.assertIs(outgoing_response.headers, outgoing_response.headers)
+            self.assertEqual(outgoing_response.headers["X-Thing"], thing_id)
+            self.assertEqual(outgoing_response.content_type, "application/json")
+            self.assertIs(outgoing_response.raw_bytes, outgoing_response.raw_bytes)
+            self.assertEqual(json.loads(outgoing_response.raw_bytes.decode('utf-8')), {"id": thing_id})
+            # The text is Bottle's own response body, which the callback's payload hasn't been set as yet.
+            self.assertEqual(outgoing_response.text, '')
+
+            self.assertIsInstance(incoming_request, IncomingRequest)
+            self.assertIsInstance(outgoing_response, OutgoingResponse)
+            return {}
+
+        self.assertEqual(TestApp(bottle_app).get("/thing/123?name=foo").status_int, 200)
+
+    def test_only_declared_locations_parsed(self):
+        environs = []
+
+        def remember_environ(*args, **kwargs):
+            environs.append(request.environ)
+
+        response = self._test_request(url="/thing/123", route_url="/thing/<thing_id>", extra_check=remember_environ)
+        self.assertEqual(response.status_int, 200)
+        response = self._test_request(method='POST', extra_check=remember_environ)
+        self.assertEqual(response.status_int, 200)
+        response = self._test_request(method='POST', url='/thing_formdata', request_json={'thing_id': '123'},
+                                      content_type='application/x-www-form-urlencoded', extra_check=remember_environ)
+        self.assertEqual(response.status_int, 200)
+
+        get_environ, json_environ, form_environ = environs
+        for key in ('bottle.request.body', 'bottle.request.forms', 'bottle.request.files', 'bottle.request.json'):
+            self.assertNotIn(key, get_environ)
+        for key in ('bottle.request.forms', 'bottle.request.files', 'bottle.request.query'):
+            self.assertNotIn(key, json_environ)
+        self.assertIn('bottle.request.json', json_environ)
+        self.assertIn('bottle.request.forms', form_environ)
+        self.assertNotIn('bottle.request.json', form_environ)
+
+    def test_json_array_reader(self):
+        items = [1, -2.5e3, u"caf\u00e9 \u2603", None, True, {"a": [1, {"b": "]"}]}, [], "", 1234567890]
+        body = json.dumps(items, ensure_ascii=False).encode('utf-8')
+        for chunk_size in (1, 2, 3, 7, 64 * 1024):
+            reader = JSONArrayReader(BytesIO(body))
+            reader.CHUNK_SIZE = chunk_size
+            self.assertTrue(reader.is_array)
+            self.assertEqual(list(reader), items)
+
+        self.assertEqual(list(JSONArrayReader(BytesIO(b' [ ] '))), [])
+        self.assertTrue(JSONArrayReader(BytesIO(b'  ')).is_empty)
+        reader = JSONArrayReader(BytesIO(b' {"id": 1}'))
+        self.assertFalse(reader.is_array)
+        self.assertEqual(reader.remainder(), {"id": 1})
+        for invalid_body in (b'[1 2]', b'[1,]', b'[1] 2', b'[1', b'[{"a": }]'):
+            with self.assertRaises(HTTPError):
+                list(JSONArrayReader(BytesIO(invalid_body)))
+
     def test_exception_handling(self):
         def throw_ex():
             raise Exception("Exception occurred")
@@ -285,6 +1019,88 @@ class TestBottleSwagger(TestCase):
         response = self._test_request(url="/thing/123", route_url="/thing/<thing_id:re:[0-9]+>")
         self.assertEqual(response.status_int, 200)
 
+    def test_swagger_op_resolved_once_per_route(self):
+        swagger_plugin = self._make_swagger_plugin()
+        lookups = []
+        original_get_op_for_request = swagger_plugin.swagger.get_op_for_request
+
+        def counting_get_op_for_request(http_method, path_pattern):
+            lookups.append((http_method, path_pattern))
+            return original_get_op_for_request(http_method, path_pattern)
+
+        swagger_plugin.swagger.get_op_for_request = counting_get_op_for_request
+
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+
+        @bottle_app.get("/thing/<thing_id>")
+        def get_thing(thing_id):
+            return {"id": thing_id}
+
+        test_app = TestApp(bottle_app)
+        for thing_id in ("1", "2", "3"):
+            response = test_app.get("/thing/" + thing_id)
+            self.assertEqual(response.status_int, 200)
+        self.assertEqual(lookups.count(("GET", "/thing/{thing_id}")), 1)
+
+    def test_non_api_routes_are_not_wrapped(self):
+        spec_with_basepath = dict(self.SWAGGER_DEF)
+        spec_with_basepath['basePath'] = "/api"
+        swagger_plugin = self._make_custom_swagger_plugin(spec_with_basepath, serve_swagger_ui=True)
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+
+        @bottle_app.get("/health")
+        def health():
+            return "OK"
+
+        @bottle_app.get("/api/undefined")
+        def undefined():
+            return "OK"
+
+        routes = dict((route.rule, route) for route in bottle_app.routes)
+        for rule in ("/health", "/api/swagger.json", "/api/ui/", "/api/ui/<path:path>"):
+            route = routes[rule]
+            self.assertIs(swagger_plugin.apply(route.callback, route), route.callback)
+
+        undefined_route = routes["/api/undefined"]
+        self.assertIsNot(swagger_plugin.apply(undefined_route.callback, undefined_route), undefined_route.callback)
+
+        test_app = TestApp(bottle_app)
+        self.assertEqual(test_app.get("/health").text, "OK")
+        self._assert_error_response(test_app.get("/api/undefined", expect_errors=True), 404)
+
+    def test_prepare(self):
+        swagger_plugin = self._make_swagger_plugin(serve_swagger_ui=True)
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+
+        @bottle_app.get("/thing")
+        def get_thing():
+            return self.VALID_JSON
+
+        self.assertIs(swagger_plugin.prepare(bottle_app), swagger_plugin)
+        self.assertEqual(len(swagger_plugin._operation_plans), 8)
+        self.assertIn(("GET", "/thing"), swagger_plugin._swagger_op_table)
+        self.assertEqual(len(swagger_plugin._swagger_schema_cache), 1)
+
+        test_app = TestApp(bottle_app)
+        self.assertEqual(test_app.get("/thing").json, self.VALID_JSON)
+        self.assertEqual(test_app.get("/swagger.json").json, self.SWAGGER_DEF)
+
+    def test_any_method_route(self):
+        bottle_app = Bottle()
+        bottle_app.install(self._make_swagger_plugin())
+
+        @bottle_app.route("/thing", "ANY")
+        def any_thing():
+            return request.json if request.method == 'POST' else self.VALID_JSON
+
+        test_app = TestApp(bottle_app)
+        self.assertEqual(test_app.get("/thing").status_int, 200)
+        self.assertEqual(test_app.post_json("/thing", self.VALID_JSON).status_int, 200)
+        self._assert_error_response(test_app.post_json("/thing", self.INVALID_JSON, expect_errors=True), 400)
+
     def test_query_parameters(self):
         response = self._test_request(url="/thing_query?thing_id=123", route_url="/thing_query")
         self.assertEqual(response.status_int, 200)
@@ -316,6 +1132,76 @@ class TestBottleSwagger(TestCase):
         response = test_app.get("/api/1.0" + SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_SUBURL)
         self.assertEqual(response.json, spec_with_basepath)
 
+    def test_get_swagger_schema_conditional_get(self):
+        bottle_app = Bottle()
+        bottle_app.install(self._make_swagger_plugin())
+        test_app = TestApp(bottle_app)
+        response = test_app.get(SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_SUBURL)
+        etag = response.headers['ETag']
+        self.assertEqual(response.headers['Cache-Control'], SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_CACHE_CONTROL)
+        self.assertEqual(response.content_type, 'application/json')
+
+        response = test_app.get(SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_SUBURL, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_int, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.body, b'')
+
+        response = test_app.get(SwaggerPlugin.DEFAULT_SWAGGER_SCHEMA_SUBURL, headers={'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.json, self.SWAGGER_DEF)
+
+    def test_get_swagger_schema_under_script_name(self):
+        spec_with_basepath = dict(self.SWAGGER_DEF)
+        spec_with_basepath['basePath'] = "/api/1.0"
+        swagger_plugin = self._make_custom_swagger_plugin(spec_with_basepath)
+        bottle_app = Bottle()
+        bottle_app.install(swagger_plugin)
+        test_app = TestApp(bottle_app)
+
+        mounted = test_app.get("/api/1.0/swagger.json", extra_environ={'SCRIPT_NAME': '/mounted'})
+        self.assertEqual(mounted.json['basePath'], "/mounted/api/1.0")
+        unmounted = test_app.get("/api/1.0/swagger.json")
+        self.assertEqual(unmounted.json['basePath'], "/api/1.0")
+        self.assertNotEqual(mounted.headers['ETag'], unmounted.headers['ETag'])
+        self.assertEqual(swagger_plugin.swagger.spec_dict['basePath'], "/api/1.0")
+
+    def test_spec_cache_dir(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            self._make_swagger_plugin(spec_cache_dir=cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            original_from_dict = Spec.from_dict
+            Spec.from_dict = None
+            try:
+                swagger_plugin = self._make_swagger_plugin(spec_cache_dir=cache_dir)
+            finally:
+                Spec.from_dict = original_from_dict
+            response = self._test_request(swagger_plugin=swagger_plugin, method='POST', request_json=self.INVALID_JSON)
+            self._assert_error_response(response, 400)
+
+            # A different configuration gets its own cache entry.
+            self._make_swagger_plugin(spec_cache_dir=cache_dir, use_bravado_models=False)
+            self.assertEqual(len(os.listdir(cache_dir)), 2)
+
+            # Only the most recently used entries are kept.
+            entry_paths = [os.path.join(cache_dir, file_name) for file_name in os.listdir(cache_dir)]
+            for path in entry_paths:
+                os.utime(path, (0, 0))
+            self._make_swagger_plugin(spec_cache_dir=cache_dir)
+            original_max_entries = bottle_swagger.SPEC_CACHE_MAX_ENTRIES
+            bottle_swagger.SPEC_CACHE_MAX_ENTRIES = 2
+            try:
+                self._make_swagger_plugin(spec_cache_dir=cache_dir, include_missing_properties=False)
+            finally:
+                bottle_swagger.SPEC_CACHE_MAX_ENTRIES = original_max_entries
+            remaining = [os.path.join(cache_dir, file_name) for file_name in os.listdir(cache_dir)]
+            self.assertEqual(len(remaining), 2)
+            self.assertEqual(len(set(entry_paths) & set(remaining)), 1)
+            self.assertFalse([file_name for file_name in os.listdir(cache_dir) if file_name.endswith('.tmp')])
+        finally:
+            shutil.rmtree(cache_dir)
+
     def test_get_swagger_ui(self):
         bottle_app = Bottle()
         bottle_app.install(self._make_swagger_plugin(serve_swagger_ui=True))
@@ -325,6 +1211,66 @@ class TestBottleSwagger(TestCase):
         for keyword in ["html", "swagger-ui", "/swagger.json"]:
             assert keyword in response.text
 
+    def test_get_swagger_ui_conditional_get(self):
+        bottle_app = Bottle()
+        swagger_plugin = self._make_swagger_plugin(serve_swagger_ui=True)
+        bottle_app.install(swagger_plugin)
+        test_app = TestApp(bottle_app)
+
+        response = test_app.get("/ui/")
+        self.assertEqual(response.content_type, 'text/html')
+        etag = response.headers['ETag']
+        self.assertEqual(test_app.get("/ui/").headers['ETag'], etag)
+        self.assertEqual(len(swagger_plugin._swagger_ui_index_cache), 1)
+
+        response = test_app.get("/ui/", headers={'If-None-Match': etag})
+        self.assertEqual(response.status_int, 304)
+
+    def test_get_swagger_ui_assets(self):
+        bottle_app = Bottle()
+        bottle_app.install(self._make_swagger_plugin(serve_swagger_ui=True))
+        test_app = TestApp(bottle_app)
+
+        versioned_url = "/ui/swagger-ui.css?v={}".format(SWAGGER_UI_VERSION)
+        plain = test_app.get(versioned_url, headers={'Accept-Encoding': 'identity'})
+        self.assertEqual(plain.status_int, 200)
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.headers['Cache-Control'], SwaggerPlugin.DEFAULT_SWAGGER_UI_ASSETS_CACHE_CONTROL)
+        # Only the URLs with the version are safe to cache for good; the others are revalidated.
+        for url in ("/ui/swagger-ui.css", "/ui/swagger-ui.css?v=0.0.1", "/ui/oauth2-redirect.html"):
+            self.assertEqual(test_app.get(url).headers['Cache-Control'], 'no-cache')
+        self.assertEqual(plain.headers['Vary'], 'Accept-Encoding')
+        self.assertTrue(plain.content_type.startswith('text/css'))
+
+        # WebTest transparently decodes compressed responses, so look at the (per encoding) ETag instead.
+        compressed = test_app.get("/ui/swagger-ui.css", headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertTrue(compressed.headers['ETag'].endswith('-gzip"'))
+        self.assertEqual(compressed.body, plain.body)
+
+        encoding, body, etag = load_swagger_ui_asset("swagger-ui.css").negotiate('gzip;q=1.0, identity;q=0.5')
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(etag, compressed.headers['ETag'])
+        self.assertLess(len(body), len(plain.body))
+        self.assertEqual(zlib.decompress(body, 16 + zlib.MAX_WBITS), plain.body)
+        self.assertIsNone(load_swagger_ui_asset("swagger-ui.css").negotiate('gzip;q=0')[0])
+
+        # However a path is spelled, it is one file (and one cache entry), and only the bundled files are served.
+        self.assertIs(load_swagger_ui_asset("x/../swagger-ui.css"), load_swagger_ui_asset("swagger-ui.css"))
+        self.assertIs(load_swagger_ui_asset("/x/../x/..//swagger-ui.css"), load_swagger_ui_asset("swagger-ui.css"))
+        self.assertIsNone(load_swagger_ui_asset("../__init__.py"))
+        self.assertEqual(test_app.get("/ui/../__init__.py", expect_errors=True).status_int, 404)
+
+        not_modified = test_app.get("/ui/swagger-ui.css", headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']
+        })
+        self.assertEqual(not_modified.status_int, 304)
+
+        favicon = test_app.get("/ui/favicon-16x16.png", headers={'Accept-Encoding': 'gzip'})
+        self.assertFalse(favicon.headers['ETag'].endswith('-gzip"'))
+
+        self.assertEqual(test_app.get("/ui/missing.js", expect_errors=True).status_int, 404)
+        self.assertEqual(test_app.get("/ui/../__init__.py", expect_errors=True).status_int, 404)
+
     def test_empty_response_body(self):
         response = self._test_request(
             url="/thing_no_resp_body",
@@ -354,6 +1300,23 @@ class TestBottleSwagger(TestCase):
         )
         self.assertEqual(response.status_int, 200)
 
+        # Responses without a schema aren't checked against what the callback returns.
+        response = self._test_request(
+            url="/thing_no_resp_body",
+            method='POST',
+            response_json=lambda: 'OK'
+        )
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.body, b'OK')
+
+        response = self._test_request(
+            url="/thing_no_resp_body",
+            method='POST',
+            response_json=lambda: (chunk for chunk in [b'O', b'K'])
+        )
+        self.assertEqual(response.status_int, 200)
+        self.assertEqual(response.body, b'OK')
+
     def test_dont_serve_schema(self):
         bottle_app = Bottle()
         bottle_app.install(self._make_swagger_plugin(
@@ -495,6 +1458,92 @@ class TestBottleSwagger(TestCase):
         # resp = test_app.get("/thing", headers={"X-API-Key": "foobar"}, expect_errors=True)
         # assert resp.status_code == 401, resp.status + "\n" + resp.body.decode('utf-8')
 
+    def test_security_plan_matches_bravado(self):
+        swagger_def = dict(self.SWAGGER_DEF_WITH_SECURITY, securityDefinitions={
+            "KeyA": {"type": "apiKey", "in": "header", "name": "X-Key-A"},
+            "KeyB": {"type": "apiKey", "in": "query", "name": "key_b"},
+            "BasicAuth": {"type": "basic"}
+        }, paths={"/thing": {}})
+        for security in [
+            [{"KeyA": []}],
+            [{"KeyA": []}, {"KeyB": []}],
+            [{"KeyA": []}, {"KeyA": [], "KeyB": []}],
+            [{"BasicAuth": []}, {"KeyB": []}],
+            [{"KeyA": []}, {}]
+        ]:
+            swagger_def["paths"]["/thing"] = {"get": {"security": security, "responses": {"200": {"description": ""}}}}
+            swagger_op = SwaggerPlugin(swagger_def).swagger.get_op_for_request("GET", "/thing")
+            security_plan = SwaggerSecurityPlan(swagger_op)
+            for request_data in ({}, {"X-Key-A": "a"}, {"key_b": "b"}, {"X-Key-A": "a", "key_b": "b"}):
+                expected = actual = None
+                try:
+                    validate_security_object(swagger_op, request_data)
+                except SwaggerSecurityValidationError as e:
+                    expected = str(e)
+                try:
+                    security_plan.check(request_data)
+                except SwaggerSecurityValidationError as e:
+                    actual = str(e)
+                self.assertEqual(actual, expected, (security, request_data))
+
+    def test_security_verifiers(self):
+        verified = []
+
+        def verify_api_key(api_key):
+            verified.append(api_key)
+            return {"user": "key-user"} if api_key == "good-key" else None
+
+        def verify_basic_auth(credentials):
+            verified.append(credentials)
+            return credentials[0] if credentials == ("foo", "bar") else False
+
+        bottle_app = Bottle()
+        bottle_app.install(self._make_security_swagger_plugin(
+            security_verifiers={"ApiKeyAuth": verify_api_key, "BasicAuth": verify_basic_auth},
+            security_cache_size=10
+        ))
+
+        @bottle_app.route("/thing", "GET")
+        def index():
+            return {"principal": request.swagger_principal}
+
+        @bottle_app.route("/thing2", "GET")
+        def bar():
+            return {"principal": request.swagger_principal}
+
+        test_app = TestApp(bottle_app)
+        for _ in range(3):
+            resp = test_app.get("/thing2", headers={"X-API-Key": "good-key"})
+            self.assertEqual(resp.json, {"principal": {"user": "key-user"}})
+        self.assertEqual(verified, ["good-key"])
+
+        for _ in range(2):
+            resp = test_app.get("/thing2", headers={"X-API-Key": "bad-key"}, expect_errors=True)
+            self._assert_error_response(resp, 401)
+        self.assertEqual(verified, ["good-key", "bad-key", "bad-key"])
+
+        test_app.authorization = ("Basic", ("foo", "bar"))
+        self.assertEqual(test_app.get("/thing").json, {"principal": "foo"})
+        test_app.authorization = ("Basic", ("foo", "baz"))
+        self._assert_error_response(test_app.get("/thing", expect_errors=True), 401)
+        test_app.authorization = None
+        self._assert_error_response(test_app.get("/thing", expect_errors=True), 401)
+
+    def test_credential_cache(self):
+        cache = CredentialCache(max_size=2, ttl=60.0)
+        cache.put(("Key", "a"), "alice")
+        cache.put(("Key", "b"), "bob")
+        self.assertEqual(cache.get(("Key", "a")), "alice")
+        cache.put(("Key", "c"), "carol")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(("Key", "b")))
+        self.assertEqual(cache.get(("Key", "a")), "alice")
+        self.assertEqual(cache.get(("Key", "c")), "carol")
+
+        expired = CredentialCache(ttl=0.0)
+        expired.put(("Key", "a"), "alice")
+        self.assertIsNone(expired.get(("Key", "a")))
+
     def test_security_spec_ignored(self):
         bottle_app = Bottle()
         debug()
@@ -583,3 +1632,89 @@ class TestBottleSwagger(TestCase):
 
     def _make_security_swagger_plugin(self, *args, **kwargs):
         return SwaggerPlugin(self.SWAGGER_DEF_WITH_SECURITY, *args, **kwargs)
+
+    def _make_custom_swagger_plugin(self, swagger_def, *args, **kwargs):
+        return SwaggerPlugin(swagger_def, *args, **kwargs)
+
+
+class TestBottleSwaggerCompiledEngine(TestBottleSwagger):
+    """
+    Runs all of the tests above with the "compiled" validation engine.
+    """
+    def test_validators_compiled_once_per_operation(self):
+        swagger_plugin = self._make_swagger_plugin()
+        response = self._test_request(swagger_plugin=swagger_plugin, method='POST')
+        self.assertEqual(response.status_int, 200)
+        plan = swagger_plugin._operation_plan(swagger_plugin.swagger.get_op_for_request('POST', '/thing'))
+        self.assertIsNotNone(plan.request_unmarshaller)
+        self.assertIsNotNone(plan.response_validator)
+
+    def test_generated_validators_match_jsonschema(self):
+        swagger_def = dict(self.SWAGGER_DEF, definitions=dict(self.SWAGGER_DEF["definitions"], **{
+            "Node": {
+                "type": "object",
+                "required": ["name"],
+                "additionalProperties": False,
+                "properties": {
+                    "name": {"type": "string", "minLength": 1, "pattern": "^[a-z]"},
+                    "size": {"type": "integer", "minimum": 0, "exclusiveMaximum": True, "maximum": 10},
+                    "ratio": {"type": "number", "multipleOf": 0.5, "x-nullable": True},
+                    "kind": {"type": "string", "enum": ["leaf", "branch"]},
+                    "created": {"type": "string", "format": "date-time"},
+                    "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 2, "uniqueItems": True},
+                    "flags": {"type": "array", "items": {"type": "string"}, "enum": ["on", "off"], "x-nullable": True},
+                    "extra": {"type": "object", "additionalProperties": {"type": "boolean"}},
+                    "children": {"type": "array", "items": {"$ref": "#/definitions/Node"}},
+                    "anything": {"anyOf": [{"type": "string"}, {"type": "integer"}]},
+                    "both": {"allOf": [{"type": "object", "required": ["a"]}, {"required": ["b"]}]}
+                }
+            }
+        }))
+        valid_values = [
+            {"name": "a"},
+            {"name": "a", "size": 9, "ratio": None, "kind": "leaf", "created": "2020-01-01T00:00:00Z"},
+            {"name": "a", "ratio": 1.5, "tags": ["x", "y"], "extra": {"on": True}, "anything": 1},
+            {"name": "a", "flags": ["on", "off"]}, {"name": "a", "flags": None},
+            {"name": "a", "children": [{"name": "b", "children": [{"name": "c"}]}], "both": {"a": 1, "b": 2}},
+        ]
+        invalid_values = [
+            [], {}, {"name": 1}, {"name": ""}, {"name": "A"}, {"name": "a", "other": 1},
+            {"name": "a", "size": 10}, {"name": "a", "size": -1}, {"name": "a", "size": True},
+            {"name": "a", "ratio": 0.3}, {"name": "a", "kind": "root"}, {"name": "a", "created": "yesterday"},
+            {"name": "a", "tags": ["x", "x"]}, {"name": "a", "tags": ["x", "y", "z"]}, {"name": "a", "tags": [1]},
+            {"name": "a", "extra": {"on": 1}}, {"name": "a", "children": [{"name": "b", "children": [{}]}]},
+            {"name": "a", "anything": 1.5}, {"name": "a", "both": {"a": 1}}, {"name": "a", "both": []},
+            {"name": "a", "flags": ["on", "maybe"]},
+        ]
+
+        from bottle_swagger import compile_schema_validator
+        # "anyOf" isn't valid Swagger 2.0, but makes for a simple keyword the generated code falls back on.
+        spec = SwaggerPlugin(swagger_def, validate_swagger_spec=False).swagger
+        node_schema = {"$ref": "#/definitions/Node"}
+        jsonschema_validator = compile_schema_validator(spec, node_schema)
+        generated_validator = compile_schema_validator(spec, node_schema, validation_engine='compiled')
+        for value in valid_values:
+            jsonschema_validator(value)
+            generated_validator(value)
+        for value in invalid_values:
+            self.assertRaises(ValidationError, jsonschema_validator, value)
+            self.assertRaises(ValidationError, generated_validator, value)
+
+        with self.assertRaises(ValidationError) as context:
+            generated_validator({"name": "a", "children": [{"name": "b", "size": 99}]})
+        self.assertEqual(list(context.exception.path), ["children", 0, "size"])
+
+    def test_unknown_validation_engine(self):
+        self.assertRaises(ValueError, self._make_swagger_plugin, validation_engine='magic')
+
+    def _make_swagger_plugin(self, *args, **kwargs):
+        kwargs.setdefault('validation_engine', 'compiled')
+        return SwaggerPlugin(self.SWAGGER_DEF, *args, **kwargs)
+
+    def _make_security_swagger_plugin(self, *args, **kwargs):
+        kwargs.setdefault('validation_engine', 'compiled')
+        return SwaggerPlugin(self.SWAGGER_DEF_WITH_SECURITY, *args, **kwargs)
+
+    def _make_custom_swagger_plugin(self, swagger_def, *args, **kwargs):
+        kwargs.setdefault('validation_engine', 'compiled')
+        return SwaggerPlugin(swagger_def, *args, **kwargs)